@@ -0,0 +1,220 @@
+"""Checkpoint size and serialization time: JsonPlusSerializer vs ContentAddressedSerializer.
+
+Runs a ReAct agent with a scripted model and CRM-like tools over the real
+``AgentStateModel`` and ``InMemorySaver``, so the checkpointer sees the same
+channel writes as in production. With the ``sqlite`` extra installed the
+same runs go through ``AsyncSqliteSaver`` as with ``CHECKPOINT_DB_PATH``,
+which passes the whole checkpoint with its channel values to the serializer;
+its latest checkpoints are loaded by a second saver on the same file with an
+empty blob cache, as another worker would. Run from the repository root::
+
+    python benchmarks/checkpoint_serde.py [--tickets 20]
+"""
+import argparse
+import asyncio
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Annotated, Any, Callable, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import InjectedToolCallId
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.prebuilt import create_react_agent
+from langgraph.types import Command
+
+from cpr_langgraph_agent.checkpoint_serde import BlobLoadingSaver, ContentAddressedSerializer, SqliteBlobStore
+from cpr_langgraph_agent.models import Address, Contract, Customer, Payment, Ticket
+from cpr_langgraph_agent.state_models import AgentStateModel
+
+ADDRESS = Address(street="Antonína Dvořáka", house_number="654", city="Praha 5", zip_code="15000", country="Czech Republic")
+CLAIM = "Dobrý den, reklamuji vyúčtování záloh za elektřinu, platby nebyly započteny správně. " * 8
+
+
+class ScriptedModel(GenericFakeChatModel):
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "ScriptedModel":
+        return self
+
+
+class MeasuringSerializer(JsonPlusSerializer):
+    """Wraps a serializer and accumulates bytes written and time spent."""
+
+    def __init__(self, inner: Any) -> None:
+        super().__init__()
+        self.inner = inner
+        self.bytes = 0
+        self.dumps_time = 0.0
+        self.loads_time = 0.0
+        self.dumps_calls = 0
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        started = time.perf_counter()
+        result = self.inner.dumps_typed(obj)
+        self.dumps_time += time.perf_counter() - started
+        self.dumps_calls += 1
+        self.bytes += len(result[1])
+        return result
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        started = time.perf_counter()
+        result = self.inner.loads_typed(data)
+        self.loads_time += time.perf_counter() - started
+        return result
+
+
+def payments(contract_id: str) -> list[Payment]:
+    return [
+        Payment(
+            payment_id=f"{contract_id}-{month}", contract_id=contract_id,
+            payer_account="6546-7324638735/1234", payee_account="3548-6387321169/4321",
+            due_amount="1500", actual_amount="500", due_date=f"2025-{month % 12 + 1:02d}-15",
+            actual_payment_date=f"2025-{month % 12 + 1:02d}-05", variable_symbol=contract_id,
+            constant_symbol="0123", specific_symbol="65498", message="Záloha na elektřinu",
+        )
+        for month in range(36)
+    ]
+
+
+def build_agent(checkpointer: Any, ticket_no: int):
+    async def get_customer_by_email(tool_call_id: Annotated[str, InjectedToolCallId]) -> Command:
+        """Load customer."""
+        customer = Customer(customer_id="123456789", first_name="Karel", last_name="Vomáčka", id_card_num="AB987654321",
+                            permanent_residence_address=ADDRESS, email="karel@test", phone="+420987654321")
+        return Command(update={"customer": customer, "messages": [ToolMessage("Loaded customer.", tool_call_id=tool_call_id)]})
+
+    async def get_customer_contracts(tool_call_id: Annotated[str, InjectedToolCallId]) -> Command:
+        """Load contracts."""
+        contracts = [
+            Contract(contract_id=f"C{i}", customer_id="123456789", consumption_point=f"EL{i}", product_id="ELEKTRINA_FIX_1R",
+                     point_of_sale="ZC_PRG_4", customer_sign_date="2024-04-16", start_date="2024-10-01", advance_payment_amount="1500")
+            for i in range(2)
+        ]
+        return Command(update={"contracts": contracts, "messages": [ToolMessage("Loaded contracts.", tool_call_id=tool_call_id)]})
+
+    async def get_contract_payments(tool_call_id: Annotated[str, InjectedToolCallId]) -> Command:
+        """Load payments."""
+        return Command(update={"payments": payments("C0") + payments("C1"), "messages": [ToolMessage("Loaded payments.", tool_call_id=tool_call_id)]})
+
+    async def find_relevant_claims(tool_call_id: Annotated[str, InjectedToolCallId]) -> Command:
+        """Search claims."""
+        # Popular claims are returned for many tickets.
+        similar = [
+            Ticket(id=f"S{(ticket_no + i) % 10}", category_1="Reklamace", category_2="Vyúčtování", category_3="Zálohy",
+                   status="closed", created_by="cc", eic="E", email="m", request_content=CLAIM, response_content=CLAIM)
+            for i in range(5)
+        ]
+        return Command(update={"similar_tickets": similar, "messages": [ToolMessage("Found similar tickets.", tool_call_id=tool_call_id)]})
+
+    tools = [get_customer_by_email, get_customer_contracts, get_contract_payments, find_relevant_claims]
+    script = [AIMessage("", tool_calls=[{"name": tool.__name__, "args": {}, "id": f"call{i}"}]) for i, tool in enumerate(tools)]
+    script.append(AIMessage(CLAIM))
+    return create_react_agent(ScriptedModel(messages=iter(script)), tools, state_schema=AgentStateModel, checkpointer=checkpointer)
+
+
+async def run_agents(checkpointer: Any, tickets: int) -> int:
+    steps = 0
+    for ticket_no in range(tickets):
+        agent = build_agent(checkpointer, ticket_no)
+        ticket = Ticket(id=f"T{ticket_no}", category_1="Reklamace", category_2="Vyúčtování", category_3="Zálohy",
+                        status="new", created_by="cc", eic="E", email="karel@test", request_content=CLAIM)
+        config = {"configurable": {"thread_id": ticket.id}}
+        state = AgentStateModel(messages=[HumanMessage("Navrhni odpověď.")], incoming_ticket=ticket)
+        await agent.ainvoke(state.model_dump(), config)
+        steps += len([item async for item in checkpointer.alist(config)])
+    return steps
+
+
+async def run(serde: Any, tickets: int) -> dict:
+    measuring = MeasuringSerializer(serde)
+    checkpointer = InMemorySaver(serde=measuring)
+    steps = await run_agents(checkpointer, tickets)
+
+    loads_before = measuring.loads_time
+    for ticket_no in range(tickets):
+        checkpointer.get_tuple({"configurable": {"thread_id": f"T{ticket_no}", "checkpoint_ns": ""}})
+    blob_bytes = getattr(getattr(serde, "blobs", None), "size", 0)
+    return {
+        "steps": steps,
+        "bytes": measuring.bytes + blob_bytes,
+        "dumps_ms": measuring.dumps_time * 1000,
+        "loads_ms": (measuring.loads_time - loads_before) * 1000,
+    }
+
+
+async def run_sqlite(create_serde: Callable[[str], Any], tickets: int, path: str) -> dict:
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    serde, reader_serde = create_serde(path), create_serde(path)
+    measuring = MeasuringSerializer(serde)
+    async with aiosqlite.connect(path) as conn, aiosqlite.connect(path) as reader_conn:
+        saver = AsyncSqliteSaver(conn, serde=measuring)
+        await saver.setup()
+        steps = await run_agents(BlobLoadingSaver(saver), tickets)
+        # A fresh saver and blob cache, the latest checkpoints are loaded as by another worker.
+        reader = BlobLoadingSaver(AsyncSqliteSaver(reader_conn, serde=reader_serde))
+        started = time.perf_counter()
+        for ticket_no in range(tickets):
+            await reader.aget_tuple({"configurable": {"thread_id": f"T{ticket_no}", "checkpoint_ns": ""}})
+        loads_time = time.perf_counter() - started
+    blob_bytes = 0
+    for store in (getattr(serde, "blobs", None), getattr(reader_serde, "blobs", None)):
+        if isinstance(store, SqliteBlobStore):
+            store.close()
+    if isinstance(getattr(serde, "blobs", None), SqliteBlobStore):
+        with sqlite3.connect(path) as db:
+            blob_bytes = db.execute("SELECT COALESCE(SUM(LENGTH(blob)), 0) FROM checkpoint_blobs_cas").fetchone()[0]
+    return {
+        "steps": steps,
+        "bytes": measuring.bytes + blob_bytes,
+        "dumps_ms": measuring.dumps_time * 1000,
+        "loads_ms": loads_time * 1000,
+    }
+
+
+def sqlite_available() -> bool:
+    try:
+        import aiosqlite  # noqa: F401
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickets", type=int, default=20)
+    args = parser.parse_args()
+
+    results = {
+        "JsonPlusSerializer": asyncio.run(run(JsonPlusSerializer(), args.tickets)),
+        "ContentAddressedSerializer": asyncio.run(run(ContentAddressedSerializer(), args.tickets)),
+    }
+    if sqlite_available():
+        with tempfile.TemporaryDirectory() as directory:
+            results["JsonPlusSerializer + SQLite"] = asyncio.run(
+                run_sqlite(lambda path: JsonPlusSerializer(), args.tickets, f"{directory}/jsonplus.sqlite")
+            )
+            results["ContentAddressed + SQLite"] = asyncio.run(
+                run_sqlite(
+                    lambda path: ContentAddressedSerializer(SqliteBlobStore(path)), args.tickets, f"{directory}/cas.sqlite",
+                )
+            )
+    else:
+        print("langgraph-checkpoint-sqlite is not installed, only InMemorySaver is measured")
+    print(f"{'serializer':<30}{'steps':>8}{'KiB stored':>12}{'B/step':>10}{'dumps ms/step':>15}{'load latest ms':>16}")
+    for name, r in results.items():
+        print(
+            f"{name:<30}{r['steps']:>8}{r['bytes'] / 1024:>12.1f}{r['bytes'] / r['steps']:>10.0f}"
+            f"{r['dumps_ms'] / r['steps']:>15.3f}{r['loads_ms'] / args.tickets:>16.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
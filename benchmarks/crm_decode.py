@@ -0,0 +1,110 @@
+"""CRM response decoding and API response rendering: dict round-trip vs direct JSON validation.
+
+Compares the former ``AsyncCrmClient`` path (``response.json()`` followed by
+``[Payment(**item) for item in ...]``) with validating the raw bytes by a
+cached ``TypeAdapter``, and ``JSONResponse`` with ``ORJSONResponse`` for the
+same payload. Reports the best time of several rounds and the peak memory
+allocated while decoding. Run from the repository root::
+
+    python benchmarks/crm_decode.py [--payments 10 1000 10000]
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from cpr_langgraph_agent.crm_client import _PAYMENTS
+from cpr_langgraph_agent.models import Payment
+
+
+def payment_history(count: int) -> bytes:
+    start = date(2015, 1, 15)
+    return json.dumps([
+        {
+            "payment_id": f"{3546687321354 + i}",
+            "contract_id": "ELC321654897",
+            "payer_account": "6546-7324638735/1234",
+            "payee_account": "3548-6387321169/4321",
+            "due_amount": "1500",
+            "actual_amount": "1450.50",
+            "due_date": (start + timedelta(days=30 * i)).isoformat(),
+            "actual_payment_date": (start + timedelta(days=30 * i - 10)).isoformat(),
+            "variable_symbol": "ELC321654897",
+            "constant_symbol": "0123",
+            "specific_symbol": "65498",
+            "message": "Záloha na elektřinu",
+        }
+        for i in range(count)
+    ], ensure_ascii=False).encode()
+
+
+def dict_round_trip(content: bytes) -> List[Payment]:
+    return [Payment(**item) for item in json.loads(content)]
+
+
+def direct_validation(content: bytes) -> List[Payment]:
+    return _PAYMENTS.validate_json(content)
+
+
+def best_time(function: Callable[[], Any], rounds: int) -> float:
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed > 0.2:
+            break
+        number *= 2
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - started) / number)
+    return min(timings)
+
+
+def peak_memory(function: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'payments':>8}  {'step':<28} {'before':>10} {'after':>10} {'speed-up':>9} {'peak before':>12} {'peak after':>11}")
+    for count in args.payments:
+        content = payment_history(count)
+        assert dict_round_trip(content) == direct_validation(content)
+        payload = [payment.model_dump(mode="json") for payment in direct_validation(content)]
+        cases = [
+            ("decode (dict -> Payment)", lambda: dict_round_trip(content), lambda: direct_validation(content)),
+            ("render (JSONResponse)", lambda: JSONResponse(payload), lambda: ORJSONResponse(payload)),
+        ]
+        for name, before, after in cases:
+            t_before, t_after = best_time(before, args.rounds), best_time(after, args.rounds)
+            m_before, m_after = peak_memory(before), peak_memory(after)
+            print(
+                f"{count:>8}  {name:<28} {t_before * 1e3:>8.3f}ms {t_after * 1e3:>8.3f}ms {t_before / t_after:>8.1f}x"
+                f" {m_before / 1024:>10.0f}KB {m_after / 1024:>9.0f}KB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""CRM client resilience against the mock server's fault injection.
+
+Starts the mock server on a local port and drives ``AsyncCrmClient``
+through two scenarios:
+
+* flaky CRM: a share of the requests fails with 503, success rate and
+  latency without and with the jittered retries;
+* outage: every request fails, the circuit breaker opens and rejects calls
+  without a request, then closes again once the CRM recovered.
+
+Run from the repository root::
+
+    python benchmarks/crm_faults.py [--requests 200] [--error-rate 0.3]
+"""
+import argparse
+import asyncio
+import socket
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import httpx
+import uvicorn
+
+from cpr_langgraph_agent.crm_client import APIError, AsyncCrmClient, CircuitOpenError
+from mock_server.app import app as mock_app
+
+
+def start_mock_server() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(mock_app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+async def set_faults(base_url: str, **settings: Any) -> None:
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        (await client.put("/_faults", json=settings)).raise_for_status()
+
+
+async def flaky(base_url: str, requests: int, error_rate: float, max_retries: int) -> Dict[str, Any]:
+    await set_faults(base_url, error_rate=error_rate)
+    client = AsyncCrmClient(base_url, max_retries=max_retries, retry_backoff=0.01, breaker_failures=10 ** 6)
+    latencies: List[float] = []
+    failed = 0
+    for _ in range(requests):
+        started = time.perf_counter()
+        try:
+            await client.get_customer_by_email("karel@example.com", timeout=5)
+        except APIError:
+            failed += 1
+        latencies.append(time.perf_counter() - started)
+    await client.aclose()
+    latencies.sort()
+    return {
+        "success_rate": round(1 - failed / requests, 3),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+
+async def outage(base_url: str) -> None:
+    client = AsyncCrmClient(base_url, max_retries=0, breaker_failures=5, breaker_reset_timeout=0.5)
+    await set_faults(base_url, error_rate=1.0)
+    failed = rejected = 0
+    started = time.perf_counter()
+    for _ in range(50):
+        try:
+            await client.get_customer_by_email("karel@example.com")
+        except CircuitOpenError:
+            rejected += 1
+        except APIError:
+            failed += 1
+    elapsed = time.perf_counter() - started
+    print(f"outage: {failed} requests failed at the CRM, {rejected} rejected by the open breaker in {elapsed * 1000:.1f} ms")
+    print(f"  breakers: {client.stats()['breakers']}")
+    await set_faults(base_url)
+    await asyncio.sleep(0.6)
+    await client.get_customer_by_email("karel@example.com")
+    stats = client.stats()
+    print(f"recovered: breakers {stats['breakers']}, pool {stats['connections']} connections ({stats['idle_connections']} idle)")
+    await client.aclose()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    args = parser.parse_args()
+
+    base_url = start_mock_server()
+    for max_retries in (0, 2):
+        result = await flaky(base_url, args.requests, args.error_rate, max_retries)
+        print(f"flaky CRM ({args.error_rate:.0%} errors), max_retries={max_retries}: {result}")
+    await outage(base_url)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,3 @@
+from cpr_langgraph_agent.server import main
+
+main()
@@ -1,25 +1,50 @@
+import logging
 import os
-import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Literal, Optional
+import httpx
 from dotenv import load_dotenv
-from fastapi import FastAPI, Body
+from fastapi import FastAPI, Body, Header, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from openai import DefaultAsyncHttpxClient
 
-from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
-from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_openai import AzureOpenAIEmbeddings
+from langchain_core.messages import HumanMessage
 from langchain_community.vectorstores.azuresearch import AzureSearch
-from azure.search.documents.indexes.models import (
-    SearchField, SearchFieldDataType, SimpleField, SearchableField
-)
 
 from cpr_langgraph_agent.models import Ticket
+from cpr_langgraph_agent.response_models import AgentResponse, JobResponse
+from cpr_langgraph_agent.jobs import Job, JobStore, JobWorkerPool
+from cpr_langgraph_agent.near_duplicates import NearDuplicateIndex
+from cpr_langgraph_agent.personalization_agent import PersonalizationAgent
+from cpr_langgraph_agent.profiling import Profiler, ProfilingSettings
+from cpr_langgraph_agent.message_log import MessageLog, MessageLogSettings
+from cpr_langgraph_agent.index_schema import fields
 from cpr_langgraph_agent.crm_client import AsyncCrmClient
+from cpr_langgraph_agent.prefetch import TicketPrefetch
+from cpr_langgraph_agent.usage import TokenPricing, UsageTracker, preload_tokenizer
+from cpr_langgraph_agent.metrics import metrics
+from cpr_langgraph_agent.checkpoint_serde import BlobLoadingSaver, ContentAddressedSerializer, SqliteBlobStore
+from cpr_langgraph_agent.server import is_worker_process
+from cpr_langgraph_agent.deadline import Deadline
+from cpr_langgraph_agent.guards import GuardLimits, RunGuard
+from cpr_langgraph_agent.memory import ConversationMemory, MemoryPolicy
+from cpr_langgraph_agent.llm import AgentChatModel
 from cpr_langgraph_agent.react_agent import ReActAgent
 from cpr_langgraph_agent.state_models import AgentStateModel
 from cpr_langgraph_agent.data_agent import DataAgent
 from cpr_langgraph_agent.search_agent import SearchAgent
 from cpr_langgraph_agent.supervisor_agent import SupervisorAgent
+from cpr_langgraph_agent.warmup import Warmup
 
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.memory import InMemorySaver
 
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
 AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
@@ -37,82 +62,314 @@ AZURE_AI_SEARCH_API_KEY = os.getenv("AZURE_AI_SEARCH_API_KEY")
 SEMANTIC_CONFIG = os.getenv("SEMANTIC_CONFIG")
 
 CRM_BASE_URL = os.getenv("CRM_BASE_URL")
+CRM_MAX_CONNECTIONS = int(os.getenv("CRM_MAX_CONNECTIONS", 100))
+CRM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("CRM_MAX_KEEPALIVE_CONNECTIONS", 20))
+CRM_HTTP2 = os.getenv("CRM_HTTP2", "false").lower() in ("1", "true", "yes")
+CRM_MAX_RETRIES = int(os.getenv("CRM_MAX_RETRIES", 2))
+CRM_BREAKER_FAILURES = int(os.getenv("CRM_BREAKER_FAILURES", 5))
+CRM_BREAKER_RESET_SECONDS = float(os.getenv("CRM_BREAKER_RESET_SECONDS", 30))
+
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", 120))
+MAX_REQUEST_TIMEOUT_SECONDS = float(os.getenv("MAX_REQUEST_TIMEOUT_SECONDS", 600))
+DISCONNECT_POLL_SECONDS = 0.5
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "false").lower() in ("1", "true", "yes")
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", 60))
+KEEPALIVE_INTERVAL_SECONDS = float(os.getenv("KEEPALIVE_INTERVAL_SECONDS", 60))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", 120))
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.sqlite")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 2))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", 7 * 24 * 3600))
+JOB_MAX_FINISHED = int(os.getenv("JOB_MAX_FINISHED", 0)) or None
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 60))
+
+NEAR_DUPLICATES_ENABLED = os.getenv("NEAR_DUPLICATES_ENABLED", "false").lower() in ("1", "true", "yes")
+NEAR_DUPLICATES_DB_PATH = os.getenv("NEAR_DUPLICATES_DB_PATH", "near_duplicates.sqlite")
+NEAR_DUPLICATES_THRESHOLD = float(os.getenv("NEAR_DUPLICATES_THRESHOLD", 0.85))
+NEAR_DUPLICATES_MAX_ENTRIES = int(os.getenv("NEAR_DUPLICATES_MAX_ENTRIES", 50000))
+NEAR_DUPLICATES_MAX_AGE_SECONDS = float(os.getenv("NEAR_DUPLICATES_MAX_AGE_SECONDS", 30 * 24 * 3600))
+
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH")
+
+token_pricing = TokenPricing.from_env()
+
+guard_limits = GuardLimits.from_env()
+
+memory_policy = MemoryPolicy.from_env()
+
+message_log = MessageLog(MessageLogSettings.from_env())
+
+profiler = Profiler(ProfilingSettings.from_env())
+
+
+class Worker:
+    """Clients, stores and agent graphs of one server process.
+
+    Built in the lifespan, i.e. in the worker process once uvicorn or
+    gunicorn started it, so connection pools, SQLite connections and
+    background tasks are never inherited across a fork. State shared by the
+    workers of a node lives in SQLite files: the job queue, the
+    near-duplicate drafts and, with ``CHECKPOINT_DB_PATH``, the checkpoints.
+    """
+
+    def __init__(self) -> None:
+        # Shared by the chat model and the embeddings, both talk to the same Azure OpenAI endpoint.
+        self.openai_http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100, keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS),
+        )
+
+        self.llm = AgentChatModel(
+            api_version=AZURE_OPENAI_API_VERSION,
+            azure_endpoint=AZURE_OPENAI_ENDPOINT,
+            azure_deployment=AZURE_OPENAI_DEPLOYMENT_NAME,
+            model=AZURE_OPENAI_MODEL_NAME,
+            api_key=AZURE_OPENAI_API_KEY,
+            timeout=60,
+            max_retries=3,
+            http_async_client=self.openai_http_client,
+        )
+
+        self.memory = ConversationMemory(self.llm, memory_policy)
+
+        embeding = AzureOpenAIEmbeddings(
+            api_version=AZURE_OPENAI_API_VERSION,
+            azure_endpoint=AZURE_OPENAI_ENDPOINT,
+            azure_deployment=AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME,
+            model=AZURE_OPENAI_EMBEDDING_MODEL_NAME,
+            api_key=AZURE_OPENAI_API_KEY,
+            http_async_client=self.openai_http_client,
+        )
+
+        self.search = AzureSearch(
+            azure_search_endpoint=AZURE_AI_SEARCH_ENDPOINT,
+            index_name=AZURE_AI_SEARCH_INDEX_NAME,
+            azure_search_key=AZURE_AI_SEARCH_API_KEY,
+            embedding_function=embeding,
+            semantic_configuration_name=SEMANTIC_CONFIG,
+            search_type="semantic_hybrid",
+            fields=fields
+        )
+
+        self.crm_client = AsyncCrmClient(
+            CRM_BASE_URL,
+            limits=httpx.Limits(
+                max_connections=CRM_MAX_CONNECTIONS,
+                max_keepalive_connections=CRM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            http2=CRM_HTTP2,
+            max_retries=CRM_MAX_RETRIES,
+            breaker_failures=CRM_BREAKER_FAILURES,
+            breaker_reset_timeout=CRM_BREAKER_RESET_SECONDS,
+        )
+
+        self.near_duplicates = NearDuplicateIndex(
+            NEAR_DUPLICATES_DB_PATH,
+            threshold=NEAR_DUPLICATES_THRESHOLD,
+            max_entries=NEAR_DUPLICATES_MAX_ENTRIES,
+            max_age_seconds=NEAR_DUPLICATES_MAX_AGE_SECONDS,
+        ) if NEAR_DUPLICATES_ENABLED else None
+
+        self.job_store = JobStore(JOB_DB_PATH, lease_seconds=JOB_LEASE_SECONDS)
+
+        self.job_pool = JobWorkerPool(
+            self.job_store,
+            run_job,
+            workers=JOB_WORKERS,
+            max_attempts=JOB_MAX_ATTEMPTS,
+            retention_seconds=JOB_RETENTION_SECONDS,
+            max_finished=JOB_MAX_FINISHED,
+        )
+
+        self._checkpoint_db: Any = None
+        self._blobs: Optional[SqliteBlobStore] = None
+
+    async def start(self) -> None:
+        self.checkpointer = await self._create_checkpointer()
+
+        self.react_agent = ReActAgent(self.llm, self.search, self.crm_client, self.checkpointer)
+
+        self.data_agent = DataAgent(self.llm, self.crm_client, self.checkpointer)
+
+        self.search_agent = SearchAgent(self.llm, self.search, self.checkpointer)
+
+        self.supervisor_agent = SupervisorAgent(self.llm, [self.data_agent.agent, self.search_agent.agent], self.checkpointer)
+
+        self.personalization_agent = PersonalizationAgent(self.llm, self.crm_client)
+
+        self.agents = {
+            'supervisor_agent': self.supervisor_agent.agent,
+            'react_agent': self.react_agent.agent,
+        }
+
+        self.warmup = Warmup(
+            self.llm,
+            self.search,
+            self.crm_client,
+            {
+                'react_agent': self.react_agent.agent,
+                'data_agent': self.data_agent.agent,
+                'search_agent': self.search_agent.agent,
+                'supervisor_agent': self.supervisor_agent.agent,
+            },
+            enabled=WARMUP_ENABLED,
+            timeout=WARMUP_TIMEOUT_SECONDS,
+            keepalive_interval=KEEPALIVE_INTERVAL_SECONDS,
+        )
+
+        # tiktoken may download its BPE file, token counts are estimated until it is loaded.
+        self._tokenizer = asyncio.create_task(asyncio.to_thread(preload_tokenizer))
+        self.warmup.start()
+        await self.job_pool.start()
 
-llm = AzureChatOpenAI(
-    api_version=AZURE_OPENAI_API_VERSION,
-    azure_endpoint=AZURE_OPENAI_ENDPOINT,
-    azure_deployment=AZURE_OPENAI_DEPLOYMENT_NAME,
-    model=AZURE_OPENAI_MODEL_NAME,
-    api_key=AZURE_OPENAI_API_KEY,
-    timeout=60,
-    max_retries=3,
-)
-
-embeding = AzureOpenAIEmbeddings(
-    api_version=AZURE_OPENAI_API_VERSION,
-    azure_endpoint=AZURE_OPENAI_ENDPOINT,
-    azure_deployment=AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME,
-    model=AZURE_OPENAI_EMBEDDING_MODEL_NAME,
-    api_key=AZURE_OPENAI_API_KEY
-)
-
-fields = [
-    SimpleField( name="id", type=SearchFieldDataType.String, key=True, filterable=True ),
-    SearchableField( name="ticket_id", type=SearchFieldDataType.String, filterable=True ),
-    SearchableField( name="category_1", type=SearchFieldDataType.String, filterable=True),
-    SearchableField( name="category_2", type=SearchFieldDataType.String, filterable=True),
-    SearchableField( name="category_3", type=SearchFieldDataType.String, filterable=True ),
-    SearchableField( name="status", type=SearchFieldDataType.String, filterable=True ),
-    SearchableField( name="created_by", type=SearchFieldDataType.String, filterable=True ),
-    SearchableField( name="eic", type=SearchFieldDataType.String, filterable=True ),
-    SearchableField( name="email", type=SearchFieldDataType.String, filterable=True ),
-    SearchableField( name="request_content", type=SearchFieldDataType.String ),
-    SearchableField( name="response_content", type=SearchFieldDataType.String ),
-    SearchField(   name="request_embedding",
-                   type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
-                   searchable=True,
-                   vector_search_dimensions=3072,
-                   vector_search_profile_name="request_embedding_profile" ),
-    SearchableField( name="filename", type=SearchFieldDataType.String, filterable=True ),
-    SearchableField( name="source_uri", type=SearchFieldDataType.String, filterable=True ),
-    SimpleField( name="index_datetime", type=SearchFieldDataType.DateTimeOffset, filterable=True),
-    SimpleField( name="deleted", type=SearchFieldDataType.Boolean, filterable=True),
-    SearchableField( name="key_phrases", type=SearchFieldDataType.Collection(SearchFieldDataType.String), searchable=True, filterable=True),
-    SearchableField( name="entities", type=SearchFieldDataType.Collection(SearchFieldDataType.String), searchable=True, filterable=True),
-]
-
-search = AzureSearch(
-    azure_search_endpoint=AZURE_AI_SEARCH_ENDPOINT,
-    index_name=AZURE_AI_SEARCH_INDEX_NAME,
-    azure_search_key=AZURE_AI_SEARCH_API_KEY,
-    embedding_function=embeding,
-    semantic_configuration_name=SEMANTIC_CONFIG,
-    search_type="semantic_hybrid",
-    fields=fields
-)
-
-crm_client = AsyncCrmClient(CRM_BASE_URL)
-
-
-
-checkpointer = InMemorySaver()
-
-react_agent = ReActAgent(llm, search, crm_client, checkpointer)
-
-data_agent = DataAgent(llm, crm_client, checkpointer)
-
-search_agent = SearchAgent(llm, search, checkpointer)
-
-supervisor_agent = SupervisorAgent(llm, [data_agent.agent, search_agent.agent], checkpointer)
-
-app = FastAPI(title="cpr_langgraph_agent")
-
-@app.post("/chat_supervisor_agent")
-async def chat_supervisor_agent(ticket: Ticket = Body(..., embed=True)):
+    async def _create_checkpointer(self) -> BaseCheckpointSaver:
+        if not CHECKPOINT_DB_PATH:
+            if is_worker_process():
+                logger.warning("Checkpoints are kept in memory per worker, set CHECKPOINT_DB_PATH to share them")
+            return InMemorySaver(serde=ContentAddressedSerializer())
+        try:
+            import aiosqlite
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        except ImportError as e:
+            raise RuntimeError("CHECKPOINT_DB_PATH requires the langgraph-checkpoint-sqlite package") from e
+        self._checkpoint_db = await aiosqlite.connect(CHECKPOINT_DB_PATH)
+        self._blobs = SqliteBlobStore(CHECKPOINT_DB_PATH)
+        checkpointer = AsyncSqliteSaver(self._checkpoint_db, serde=ContentAddressedSerializer(self._blobs))
+        await checkpointer.setup()
+        # Blobs of checkpoints written by other workers are read off the event loop.
+        return BlobLoadingSaver(checkpointer)
+
+    async def aclose(self) -> None:
+        await self.job_pool.aclose()
+        self.job_store.close()
+        if self.near_duplicates is not None:
+            self.near_duplicates.close()
+        await self.warmup.aclose()
+        await asyncio.gather(self._tokenizer, return_exceptions=True)
+        if self._checkpoint_db is not None:
+            await self._checkpoint_db.close()
+        if self._blobs is not None:
+            self._blobs.close()
+        await self.crm_client.aclose()
+        await self.openai_http_client.aclose()
+
+
+# Created in the lifespan of every worker process.
+worker: Optional[Worker] = None
+
+async def run_job(job: Job) -> Dict[str, Any]:
+    response = await run_agent(job.agent, worker.agents[job.agent], job.ticket, None, job.timeout, profile=profiler.should_profile())
+    return response.model_dump(mode='json', exclude_none=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global worker
+    message_log.start()
+    worker = Worker()
+    await worker.start()
+    yield
+    await worker.aclose()
+    await message_log.aclose()
+
+app = FastAPI(title="cpr_langgraph_agent", lifespan=lifespan, default_response_class=ORJSONResponse)
+
+@app.get("/health/live")
+async def health_live():
+    return {'status': 'ok'}
+
+@app.get("/health/ready")
+async def health_ready():
+    """Ready once the startup warm-up finished (immediately when it is disabled)."""
+    return ORJSONResponse(worker.warmup.status(), status_code=200 if worker.warmup.ready else 503)
+
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
+def _check_profile_token(x_profile: Optional[str]) -> None:
+    if profiler.settings.token is None:
+        raise HTTPException(status_code=404, detail='Profiling admin is disabled, set PROFILE_TOKEN to enable it')
+    if x_profile != profiler.settings.token:
+        raise HTTPException(status_code=403, detail='Missing or wrong X-Profile token')
+
+@app.get("/admin/profiling")
+async def get_profiling(x_profile: Optional[str] = Header(None)):
+    _check_profile_token(x_profile)
+    return profiler.status()
+
+@app.post("/admin/profiling")
+async def set_profiling(
+    sample_rate: float = Body(..., embed=True, ge=0, le=1),
+    x_profile: Optional[str] = Header(None),
+):
+    """Set the share of runs profiled without the ``X-Profile`` header."""
+    _check_profile_token(x_profile)
+    profiler.settings.sample_rate = sample_rate
+    return profiler.status()
+
+@app.get("/crm/stats")
+async def get_crm_stats():
+    """Connection pool usage and circuit breaker states of the CRM client of this worker."""
+    return worker.crm_client.stats()
+
+@app.get("/near_duplicates")
+async def get_near_duplicates():
+    """Size and hit rate of the near-duplicate index."""
+    if worker.near_duplicates is None:
+        raise HTTPException(status_code=404, detail='Near-duplicate detection is disabled')
+    return await asyncio.to_thread(worker.near_duplicates.stats)
+
+async def _cancel_on_disconnect(request: Request, task: asyncio.Task) -> None:
+    while not task.done():
+        if await request.is_disconnected():
+            task.cancel()
+            return
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+async def _personalize(ticket: Ticket, match: Any, config: Dict[str, Any]) -> Dict[str, Any]:
+    messages = await worker.personalization_agent.apersonalize(ticket, match, config)
+    return {'messages': messages, 'incoming_ticket': ticket}
+
+async def run_agent(
+    name: str,
+    agent: Any,
+    ticket: Ticket,
+    request: Optional[Request],
+    timeout: Optional[float],
+    include: Optional[str] = None,
+    profile: bool = False,
+) -> AgentResponse:
+    """Run the agent graph for the ticket within the request deadline.
+
+    The deadline is taken from the ``X-Request-Timeout`` header (seconds) or
+    ``REQUEST_TIMEOUT_SECONDS``. All in-flight work is cancelled once the
+    deadline passes or the client disconnects (jobs run without a request).
+    ``include=trace`` adds the full agent state to the response, with
+    ``profile`` the run is profiled and the profile path is returned.
+
+    A near-duplicate of an already processed ticket skips the graph, the
+    draft of the earlier ticket is only personalized by a single LLM call.
+    """
+    started = time.monotonic()
+    deadline = Deadline.after(min(timeout or REQUEST_TIMEOUT_SECONDS, MAX_REQUEST_TIMEOUT_SECONDS))
+    near_duplicates = worker.near_duplicates
+    match = await asyncio.to_thread(near_duplicates.lookup, ticket) if near_duplicates is not None else None
+    prefetch = TicketPrefetch(ticket, worker.crm_client, worker.search, deadline).start() if match is None else None
+    usage = UsageTracker(name, token_pricing)
+    guard = RunGuard(guard_limits, usage)
+    session = profiler.start(ticket.id, name) if profile else None
     config = {
         'configurable': {
-            'thread_id': ticket.id
-        }
+            'thread_id': ticket.id,
+            'prefetch': prefetch,
+            'usage': usage,
+            'deadline': deadline,
+            'guard': guard,
+            'memory': worker.memory,
+        },
+        'callbacks': [usage] if session is None else [usage, session.node_timer],
     }
 
     state = AgentStateModel(
@@ -122,43 +379,110 @@ async def chat_supervisor_agent(ticket: Ticket = Body(..., embed=True)):
         incoming_ticket=ticket,
     )
 
-    output = await supervisor_agent.agent.ainvoke(
-        input = state.model_dump(),
-        config=config,
+    if match is None:
+        task = asyncio.create_task(agent.ainvoke(
+            # The summary cached in the thread must not be reset by the input of the new run.
+            input = state.model_dump(exclude={'conversation_summary'}),
+            config=config,
+        ))
+    else:
+        task = asyncio.create_task(_personalize(ticket, match, config))
+    watcher = asyncio.create_task(_cancel_on_disconnect(request, task)) if request is not None else None
+    try:
+        output = await asyncio.wait_for(task, timeout=deadline.remaining())
+    except asyncio.TimeoutError:
+        metrics.increment("requests_timed_out", agent=name)
+        raise HTTPException(status_code=504, detail='Request deadline exceeded')
+    except asyncio.CancelledError:
+        if watcher is None or not watcher.done():
+            raise
+        metrics.increment("requests_disconnected", agent=name)
+        raise HTTPException(status_code=499, detail='Client disconnected')
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if prefetch is not None:
+            prefetch.cancel()
+        usage.publish()
+        profile_path = await session.stop() if session is not None else None
+    response = AgentResponse.from_output(
+        ticket.id,
+        output,
+        usage=usage.summary(),
+        guard=guard.summary(),
+        trace=jsonable_encoder(output) if include == 'trace' else None,
+        profile=str(profile_path) if profile_path is not None else None,
     )
-    for message in output['messages']:
-        if isinstance(message, BaseMessage):
-            m: BaseMessage=message
-            print(json.dumps(m.model_dump(), ensure_ascii=False, indent=4))
-    return output
-
-@app.post("/chat_react_agent")
-async def chat_react_agent(ticket: Ticket = Body(..., embed=True)):
-    
-    config = {
-        'configurable': {
-            'thread_id': ticket.id
-        }
-    }
+    if match is not None:
+        response.near_duplicate_of = match.ticket_id
+        response.similarity = match.similarity
+    elif near_duplicates is not None and response.draft_reply and not guard.terminated:
+        await asyncio.to_thread(near_duplicates.add, ticket, response.draft_reply)
 
-    state = AgentStateModel(
-        messages=[
-                HumanMessage(f'Navrhni mi vhodnou odpověď na tento zákaznický požadavek na reklamaci.')
-            ],
-        incoming_ticket=ticket,
+    # The thread of the ticket also holds the messages of its earlier runs.
+    messages = output['messages']
+    run_start = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=0)
+    message_log.log_run(
+        name,
+        ticket.id,
+        messages[run_start:],
+        duration_seconds=round(time.monotonic() - started, 3),
+        total_tokens=usage.total_tokens,
+        guard=response.guard,
+        near_duplicate_of=response.near_duplicate_of,
     )
+    return response
 
-    output = await react_agent.agent.ainvoke(
-        input = state.model_dump(),
-        config=config,
+@app.post("/chat_supervisor_agent", response_model=AgentResponse, response_model_exclude_none=True)
+async def chat_supervisor_agent(
+    request: Request,
+    ticket: Ticket = Body(..., embed=True),
+    x_request_timeout: Optional[float] = Header(None),
+    include: Optional[str] = Query(None, pattern='^trace$'),
+    x_profile: Optional[str] = Header(None),
+):
+    return await run_agent(
+        'supervisor_agent', worker.supervisor_agent.agent, ticket, request, x_request_timeout, include, profile=profiler.should_profile(x_profile)
     )
 
-    for message in output['messages']:
-        if isinstance(message, BaseMessage):
-            m: BaseMessage=message
-            print(json.dumps(m.model_dump(), ensure_ascii=False, indent=4))
-    return output
+@app.post("/chat_react_agent", response_model=AgentResponse, response_model_exclude_none=True)
+async def chat_react_agent(
+    request: Request,
+    ticket: Ticket = Body(..., embed=True),
+    x_request_timeout: Optional[float] = Header(None),
+    include: Optional[str] = Query(None, pattern='^trace$'),
+    x_profile: Optional[str] = Header(None),
+):
+    return await run_agent(
+        'react_agent', worker.react_agent.agent, ticket, request, x_request_timeout, include, profile=profiler.should_profile(x_profile)
+    )
+
+@app.post("/jobs", response_model=JobResponse, response_model_exclude_none=True, status_code=202)
+async def submit_job(
+    ticket: Ticket = Body(..., embed=True),
+    agent: Literal['supervisor_agent', 'react_agent'] = Body('supervisor_agent'),
+    x_request_timeout: Optional[float] = Header(None),
+):
+    """Queue the ticket and return at once, the same ticket submitted again returns the existing job."""
+    job = await asyncio.to_thread(worker.job_store.submit, agent, ticket, x_request_timeout)
+    worker.job_pool.notify()
+    return JobResponse.from_job(job)
+
+@app.get("/jobs/{job_id}", response_model=JobResponse, response_model_exclude_none=True)
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(worker.job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Job not found')
+    return JobResponse.from_job(job)
+
+@app.get("/drafts/{ticket_id}", response_model=AgentResponse, response_model_exclude_none=True)
+async def get_draft(ticket_id: str, agent: Optional[Literal['supervisor_agent', 'react_agent']] = Query(None)):
+    """The latest draft of the ticket produced by a finished job."""
+    job = await asyncio.to_thread(worker.job_store.latest_draft, ticket_id, agent)
+    if job is None:
+        raise HTTPException(status_code=404, detail='No draft for the ticket')
+    return job.result
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run("cpr_langgraph_agent.app:app", host="0.0.0.0", port=8000, reload=False)
\ No newline at end of file
+    from cpr_langgraph_agent.server import main
+    main()
\ No newline at end of file
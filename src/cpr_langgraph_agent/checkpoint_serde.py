@@ -0,0 +1,748 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from cpr_langgraph_agent.metrics import metrics
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is an optional speed-up
+    zstandard = None
+
+__all__ = [
+    "BlobLoadingSaver",
+    "BlobStore",
+    "BlobsNotLoaded",
+    "ContentAddressedSerializer",
+    "InMemoryBlobStore",
+    "SqliteBlobStore",
+    "collect_blobs",
+    "delete_threads",
+    "referenced_digests",
+]
+
+logger = logging.getLogger(__name__)
+
+TYPE = "cas"
+
+# Payload kinds
+_VALUE = b"V"
+_LIST = b"L"
+_CHECKPOINT = b"C"
+# Reference kinds
+_INLINE = b"I"
+_PACKED = b"P"
+_HASH = b"H"
+# Blob codecs
+_RAW = b"r"
+_ZLIB = b"d"
+_ZSTD = b"z"
+
+_DIGEST_SIZE = 16
+_LENGTH = struct.Struct(">I")
+
+# Blobs of a checkpoint written by another worker are written a moment after its row is committed.
+_READ_DELAYS = (0.0, 0.01, 0.05, 0.2)
+_READ_BATCH_SIZE = 500
+
+
+def _next_ref(payload: memoryview, position: int) -> Tuple[bytes, bytes, int]:
+    kind = bytes(payload[position:position + 1])
+    position += 1
+    if kind == _HASH:
+        return kind, bytes(payload[position:position + _DIGEST_SIZE]), position + _DIGEST_SIZE
+    (length,) = _LENGTH.unpack_from(payload, position)
+    position += _LENGTH.size
+    return kind, bytes(payload[position:position + length]), position + length
+
+
+def _iter_refs(payload: memoryview) -> Iterator[Tuple[bytes, bytes]]:
+    position = 0
+    while position < len(payload):
+        kind, value, position = _next_ref(payload, position)
+        yield kind, value
+
+
+def _split_checkpoint(payload: memoryview) -> Tuple[Tuple[bytes, bytes], List[Tuple[str, memoryview]]]:
+    """The checkpoint without its channel values and the payload of every channel value."""
+    kind, skeleton, position = _next_ref(payload, 1)
+    channels = []
+    while position < len(payload):
+        (length,) = _LENGTH.unpack_from(payload, position)
+        position += _LENGTH.size
+        name = bytes(payload[position:position + length]).decode()
+        position += length
+        (length,) = _LENGTH.unpack_from(payload, position)
+        position += _LENGTH.size
+        channels.append((name, payload[position:position + length]))
+        position += length
+    return (kind, skeleton), channels
+
+
+def _payload_digests(payload: memoryview) -> Iterator[bytes]:
+    if payload[:1] == _CHECKPOINT:
+        for _, value in _split_checkpoint(payload)[1]:
+            yield from _payload_digests(value)
+    else:
+        yield from (value for kind, value in _iter_refs(payload[1:]) if kind == _HASH)
+
+
+def _is_checkpoint(obj: Any) -> bool:
+    # Savers storing the channel values inside the checkpoint (AsyncSqliteSaver) pass it whole.
+    return isinstance(obj, dict) and isinstance(obj.get("channel_values"), dict) and "channel_versions" in obj
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class BlobsNotLoaded(Exception):
+    """Blobs a value refers to are not in memory and reading them would block the event loop.
+
+    Raised by ``SqliteBlobStore`` on the event loop, ``BlobLoadingSaver``
+    loads ``digests`` with ``blobs.aload`` and reads the checkpoint again.
+    """
+
+    def __init__(self, blobs: "BlobStore", digests: Set[bytes]) -> None:
+        super().__init__(f"{len(digests)} checkpoint blobs are not loaded")
+        self.blobs = blobs
+        self.digests = digests
+
+
+class BlobStore:
+    """Content addressed storage of serialized values."""
+
+    def get(self, digest: bytes) -> bytes:
+        raise NotImplementedError
+
+    def put(self, digest: bytes, blob: bytes) -> None:
+        raise NotImplementedError
+
+    def __contains__(self, digest: bytes) -> bool:
+        raise NotImplementedError
+
+    def ensure_loaded(self, digests: Set[bytes]) -> None:
+        """Make ``get`` answer ``digests`` without I/O, a no-op for stores kept in memory."""
+
+    async def aload(self, digests: Set[bytes]) -> None:
+        """Load ``digests`` without blocking the event loop."""
+
+
+def referenced_digests(payloads: Iterable[Tuple[str, bytes]]) -> Set[bytes]:
+    """Digests of the blobs referred to by values serialized with ``ContentAddressedSerializer``."""
+    digests: Set[bytes] = set()
+    for type_, payload in payloads:
+        if type_ == TYPE and payload:
+            digests.update(_payload_digests(memoryview(payload)))
+    return digests
+
+
+class InMemoryBlobStore(BlobStore):
+    def __init__(self) -> None:
+        self._blobs: Dict[bytes, bytes] = {}
+
+    def get(self, digest: bytes) -> bytes:
+        return self._blobs[digest]
+
+    def put(self, digest: bytes, blob: bytes) -> None:
+        self._blobs.setdefault(digest, blob)
+
+    def __contains__(self, digest: bytes) -> bool:
+        return digest in self._blobs
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    @property
+    def size(self) -> int:
+        return sum(len(blob) for blob in self._blobs.values())
+
+    def sweep(self, live: Set[bytes]) -> int:
+        """Delete the blobs not in ``live``, returns their count."""
+        dead = [digest for digest in self._blobs if digest not in live]
+        for digest in dead:
+            del self._blobs[digest]
+        return len(dead)
+
+
+class SqliteBlobStore(BlobStore):
+    """Blobs in a SQLite file, shared by all worker processes using the same ``path``.
+
+    The checkpointer calls the serializer synchronously on the event loop,
+    so the database is only used by the store's own threads: one writes,
+    the other reads with its own connection and does not wait behind the
+    writes or ``collect``. ``put`` keeps the blob in memory and queues the
+    write, ``__contains__`` knows the digests this process wrote or read (a
+    miss only writes the blob again, the insert is ignored) and ``get``
+    answers from a cache of recent blobs. A blob this process has not seen,
+    of a checkpoint written by another worker or before a restart, is not
+    read on the event loop: ``BlobsNotLoaded`` is raised instead and
+    ``BlobLoadingSaver`` loads it with ``aload``. Off the event loop it is
+    read while the caller waits.
+
+    Blobs are immutable and keyed by their hash, so concurrent writers of
+    the same blob do not conflict and readers need no coordination.
+    Every write stamps ``touched_at``; a digest this process has not written
+    for a quarter of ``grace_seconds`` is written again, so ``collect``
+    never deletes a blob a checkpoint is being written with, and a blob
+    swept meanwhile is restored.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        cache_size: int = 32 * 1024 * 1024,
+        known_digests: int = 100_000,
+        grace_seconds: float = 600.0,
+    ) -> None:
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix='checkpoint-blobs')
+        self._db = self._io.submit(self._connect, path).result()
+        self._reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='checkpoint-blobs-read')
+        self._read_db = self._reader.submit(sqlite3.connect, path).result()
+        # Guards the in-memory state below, the database is only used by the I/O thread.
+        self._lock = threading.Lock()
+        self._pending: Dict[bytes, bytes] = {}
+        self._flush_queued = False
+        self._cache: OrderedDict[bytes, bytes] = OrderedDict()
+        self._cache_bytes = 0
+        self._cache_size = cache_size
+        # Digest -> when this process last wrote it, 0 for blobs it only read.
+        self._known: OrderedDict[bytes, float] = OrderedDict()
+        self._known_digests = known_digests
+        self._grace_seconds = grace_seconds
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(path, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoint_blobs_cas (digest BLOB PRIMARY KEY, blob BLOB NOT NULL, touched_at REAL)"
+            )
+            if 'touched_at' not in {row[1] for row in db.execute("PRAGMA table_info(checkpoint_blobs_cas)")}:
+                # Databases created before blobs were collected.
+                db.execute("ALTER TABLE checkpoint_blobs_cas ADD COLUMN touched_at REAL")
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return db
+
+    def get(self, digest: bytes) -> bytes:
+        with self._lock:
+            blob = self._lookup(digest)
+        if blob is None:
+            self.ensure_loaded({digest})
+            with self._lock:
+                blob = self._lookup(digest)
+            if blob is None:
+                # Evicted right after it was read, only possible with a cache smaller than a checkpoint.
+                raise KeyError(digest)
+        return blob
+
+    def ensure_loaded(self, digests: Set[bytes]) -> None:
+        missing = self._missing(digests)
+        if not missing:
+            return
+        if _on_event_loop():
+            raise BlobsNotLoaded(self, missing)
+        for delay in _READ_DELAYS:
+            time.sleep(delay)
+            missing = self._store_read(self._reader.submit(self._read, missing).result(), missing)
+            if not missing:
+                return
+        raise KeyError(next(iter(missing)))
+
+    async def aload(self, digests: Set[bytes]) -> None:
+        missing = self._missing(digests)
+        loop = asyncio.get_running_loop()
+        for delay in _READ_DELAYS:
+            if not missing:
+                return
+            await asyncio.sleep(delay)
+            missing = self._store_read(await loop.run_in_executor(self._reader, self._read, missing), missing)
+        if missing:
+            raise KeyError(next(iter(missing)))
+
+    def put(self, digest: bytes, blob: bytes) -> None:
+        with self._lock:
+            self._pending.setdefault(digest, blob)
+            if self._flush_queued:
+                return
+            self._flush_queued = True
+        self._io.submit(self._flush)
+
+    def __contains__(self, digest: bytes) -> bool:
+        with self._lock:
+            if digest in self._pending:
+                return True
+            written = self._known.get(digest)
+            if written is None:
+                return False
+            self._known.move_to_end(digest)
+            return time.time() - written < self._grace_seconds / 4
+
+    def flush(self) -> None:
+        """Wait until the queued blobs are written."""
+        self._io.submit(self._flush).result()
+
+    def collect(self) -> int:
+        """Delete the blobs no checkpoint or pending write of the database refers to, returns their count.
+
+        Blocking, the mark reads the serialized rows of the ``checkpoints``
+        and ``writes`` tables of the SQLite checkpointer sharing the file.
+        """
+        return self._io.submit(self._collect).result()
+
+    def close(self) -> None:
+        self.flush()
+        self._io.submit(self._db.close).result()
+        self._io.shutdown()
+        self._reader.submit(self._read_db.close).result()
+        self._reader.shutdown()
+
+    # ---------------------------------------------------------------------
+    # In-memory state
+    # ---------------------------------------------------------------------
+    def _lookup(self, digest: bytes) -> Optional[bytes]:
+        # Called with the lock held.
+        blob = self._pending.get(digest)
+        if blob is None and digest in self._cache:
+            self._cache.move_to_end(digest)
+            blob = self._cache[digest]
+        return blob
+
+    def _missing(self, digests: Set[bytes]) -> Set[bytes]:
+        with self._lock:
+            return {digest for digest in digests if digest not in self._pending and digest not in self._cache}
+
+    def _store_read(self, blobs: Dict[bytes, bytes], requested: Set[bytes]) -> Set[bytes]:
+        """Cache the blobs read from the database, returns the requested digests not found."""
+        with self._lock:
+            for digest, blob in blobs.items():
+                self._remember(digest, blob, 0.0)
+        return requested - blobs.keys()
+
+    def _remember(self, digest: bytes, blob: bytes, written: float) -> None:
+        self._known[digest] = max(written, self._known.get(digest, 0.0))
+        self._known.move_to_end(digest)
+        while len(self._known) > self._known_digests:
+            self._known.popitem(last=False)
+        if digest not in self._cache:
+            self._cache[digest] = blob
+            self._cache_bytes += len(blob)
+        while self._cache_bytes > self._cache_size:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+
+    # ---------------------------------------------------------------------
+    # I/O thread
+    # ---------------------------------------------------------------------
+    def _flush(self) -> None:
+        with self._lock:
+            self._flush_queued = False
+            batch = list(self._pending.items())
+        if not batch:
+            return
+        now = time.time()
+        self._db.execute("BEGIN")
+        try:
+            self._db.executemany(
+                "INSERT INTO checkpoint_blobs_cas (digest, blob, touched_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (digest) DO UPDATE SET touched_at = excluded.touched_at",
+                [(digest, blob, now) for digest, blob in batch],
+            )
+            self._db.execute("COMMIT")
+        except sqlite3.Error as e:
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+            # The blobs stay pending, the next put or flush writes them again.
+            logger.warning("Writing %d checkpoint blobs failed: %r", len(batch), e)
+            return
+        with self._lock:
+            for digest, blob in batch:
+                self._pending.pop(digest, None)
+                self._remember(digest, blob, now)
+
+    def _collect(self) -> int:
+        started = time.time()
+        try:
+            live = referenced_digests(self._db.execute(
+                "SELECT type, checkpoint FROM checkpoints UNION ALL SELECT type, value FROM writes"
+            ))
+        except sqlite3.OperationalError as e:
+            # Not the file of a SQLite checkpointer (or not set up yet), nothing tells which blobs are in use.
+            logger.warning("Checkpoint blobs not collected: %r", e)
+            return 0
+        candidates = self._db.execute(
+            "SELECT digest FROM checkpoint_blobs_cas WHERE touched_at IS NULL OR touched_at < ?",
+            (started - self._grace_seconds,),
+        ).fetchall()
+        dead = [(digest,) for (digest,) in candidates if digest not in live]
+        if dead:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany("DELETE FROM checkpoint_blobs_cas WHERE digest = ?", dead)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return len(dead)
+
+    # ---------------------------------------------------------------------
+    # Reader thread
+    # ---------------------------------------------------------------------
+    def _read(self, digests: Set[bytes]) -> Dict[bytes, bytes]:
+        digests = list(digests)
+        blobs: Dict[bytes, bytes] = {}
+        for i in range(0, len(digests), _READ_BATCH_SIZE):
+            batch = digests[i:i + _READ_BATCH_SIZE]
+            blobs.update(self._read_db.execute(
+                f"SELECT digest, blob FROM checkpoint_blobs_cas WHERE digest IN ({', '.join('?' * len(batch))})",
+                batch,
+            ))
+        return blobs
+
+
+class ContentAddressedSerializer(SerializerProtocol):
+    """Checkpoint serializer storing every value once by its content hash.
+
+    LangGraph re-serializes a channel every time its version changes. The
+    ``messages`` channel changes on every step although only a message or
+    two were appended, and the same data lists are written again by every
+    graph sharing the checkpointer. This serializer splits lists into chunks
+    of ``chunk_size`` items, stores each chunk compressed in a ``BlobStore``
+    under its hash and returns only the list of hashes. Channel lists only
+    grow at the end, so a step costs the last chunk plus 16 bytes per
+    unchanged one. Values smaller than ``min_blob_size`` are kept inline,
+    the hash would not save anything.
+
+    Savers such as ``AsyncSqliteSaver`` pass the whole checkpoint including
+    its ``channel_values``; every channel value is then stored on its own
+    the same way and the rest of the checkpoint, which changes on every
+    step, is kept inline compressed. An unchanged channel costs its hash.
+
+    Values are encoded by the default ``JsonPlusSerializer``, checkpoints
+    written by it are still readable.
+    """
+
+    def __init__(
+        self,
+        blobs: Optional[BlobStore] = None,
+        *,
+        inner: Optional[SerializerProtocol] = None,
+        chunk_size: int = 8,
+        min_blob_size: int = 128,
+        compression_level: int = 3,
+    ) -> None:
+        self.blobs = blobs if blobs is not None else InMemoryBlobStore()
+        self._inner = inner or JsonPlusSerializer()
+        self._chunk_size = chunk_size
+        self._min_blob_size = min_blob_size
+        self._compression_level = compression_level
+        # zstd contexts are not thread-safe, the sync checkpointer API may be used from several threads.
+        self._local = threading.local()
+
+    # ---------------------------------------------------------------------
+    # SerializerProtocol
+    # ---------------------------------------------------------------------
+    def dumps(self, obj: Any) -> bytes:
+        return self._inner.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self._inner.loads(data)
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        if not _is_checkpoint(obj):
+            return TYPE, self._dump_payload(obj)
+        parts = [_CHECKPOINT, self._dump_packed({**obj, "channel_values": {}})]
+        for name, value in obj["channel_values"].items():
+            encoded_name, payload = name.encode(), self._dump_payload(value)
+            parts += [_LENGTH.pack(len(encoded_name)), encoded_name, _LENGTH.pack(len(payload)), payload]
+        return TYPE, b"".join(parts)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_ != TYPE:
+            return self._inner.loads_typed(data)
+        payload = memoryview(payload)
+        # All blobs at once, a store reading them from a database does it in one go.
+        self.blobs.ensure_loaded(set(_payload_digests(payload)))
+        return self._load_payload(payload)
+
+    # ---------------------------------------------------------------------
+    # Encoding
+    # ---------------------------------------------------------------------
+    def _dump_payload(self, obj: Any) -> bytes:
+        if isinstance(obj, list):
+            chunks = (obj[i:i + self._chunk_size] for i in range(0, len(obj), self._chunk_size))
+            return _LIST + b"".join(self._dump_ref(chunk) for chunk in chunks)
+        return _VALUE + self._dump_ref(obj)
+
+    def _load_payload(self, payload: memoryview) -> Any:
+        if payload[:1] == _CHECKPOINT:
+            (kind, skeleton), channels = _split_checkpoint(payload)
+            checkpoint = self._load_ref(kind, skeleton)
+            checkpoint["channel_values"] = {name: self._load_payload(value) for name, value in channels}
+            return checkpoint
+        refs = _iter_refs(payload[1:])
+        if payload[:1] == _LIST:
+            return [item for kind, value in refs for item in self._load_ref(kind, value)]
+        kind, value = next(refs)
+        return self._load_ref(kind, value)
+
+    def _dump_packed(self, obj: Any) -> bytes:
+        # Compressed but inline, the value is different every time and would not be shared.
+        inner_type, data = self._inner.dumps_typed(obj)
+        blob = self._compress(inner_type.encode() + b"\0" + data)
+        return _PACKED + _LENGTH.pack(len(blob)) + blob
+
+    def _dump_ref(self, obj: Any) -> bytes:
+        inner_type, data = self._inner.dumps_typed(obj)
+        raw = inner_type.encode() + b"\0" + data
+        if len(raw) < self._min_blob_size:
+            return _INLINE + _LENGTH.pack(len(raw)) + raw
+        digest = hashlib.blake2b(raw, digest_size=_DIGEST_SIZE).digest()
+        if digest not in self.blobs:
+            self.blobs.put(digest, self._compress(raw))
+        return _HASH + digest
+
+    def _load_ref(self, kind: bytes, value: bytes) -> Any:
+        if kind == _INLINE:
+            raw = value
+        else:
+            raw = self._decompress(value if kind == _PACKED else self.blobs.get(value))
+        inner_type, _, data = raw.partition(b"\0")
+        return self._inner.loads_typed((inner_type.decode(), data))
+
+    # ---------------------------------------------------------------------
+    # Compression
+    # ---------------------------------------------------------------------
+    def _compress(self, raw: bytes) -> bytes:
+        if zstandard is not None:
+            compressor = getattr(self._local, "compressor", None)
+            if compressor is None:
+                compressor = self._local.compressor = zstandard.ZstdCompressor(level=self._compression_level)
+            codec, compressed = _ZSTD, compressor.compress(raw)
+        else:
+            codec, compressed = _ZLIB, zlib.compress(raw, self._compression_level)
+        if len(compressed) >= len(raw):
+            return _RAW + raw
+        return codec + compressed
+
+    def _decompress(self, blob: bytes) -> bytes:
+        codec, data = blob[:1], blob[1:]
+        if codec == _ZSTD:
+            decompressor = getattr(self._local, "decompressor", None)
+            if decompressor is None:
+                decompressor = self._local.decompressor = zstandard.ZstdDecompressor()
+            return decompressor.decompress(data)
+        if codec == _ZLIB:
+            return zlib.decompress(data)
+        return data
+
+
+def _in_memory_payloads(checkpointer: InMemorySaver) -> Iterator[Tuple[str, bytes]]:
+    for namespaces in checkpointer.storage.values():
+        for checkpoints in namespaces.values():
+            for checkpoint, metadata, _ in checkpoints.values():
+                yield checkpoint
+                yield metadata
+    yield from checkpointer.blobs.values()
+    for writes in checkpointer.writes.values():
+        for write in writes.values():
+            yield write[2]
+
+
+async def collect_blobs(checkpointer: BaseCheckpointSaver) -> int:
+    """Delete the blobs no checkpoint of ``checkpointer`` refers to any more, returns their count.
+
+    Mark and sweep over the serialized checkpoints and pending writes,
+    nothing is deserialized. A no-op for other serializers and
+    checkpointers the blob store can not scan.
+    """
+    serde = checkpointer.serde
+    if not isinstance(serde, ContentAddressedSerializer):
+        return 0
+    if isinstance(serde.blobs, SqliteBlobStore):
+        collected = await asyncio.to_thread(serde.blobs.collect)
+    elif isinstance(serde.blobs, InMemoryBlobStore) and isinstance(checkpointer, InMemorySaver):
+        # No await between mark and sweep, no checkpoint can be written in between.
+        collected = serde.blobs.sweep(referenced_digests(_in_memory_payloads(checkpointer)))
+    else:
+        return 0
+    metrics.increment("checkpoint_blobs_collected", collected)
+    return collected
+
+
+async def delete_threads(checkpointer: BaseCheckpointSaver, thread_ids: Iterable[str]) -> None:
+    """Delete the checkpoints of threads together with the blobs only they referred to.
+
+    The blobs are collected once after all threads are deleted, each
+    collection scans every checkpoint.
+    """
+    for thread_id in thread_ids:
+        await checkpointer.adelete_thread(thread_id)
+    await collect_blobs(checkpointer)
+
+
+class BlobLoadingSaver(BaseCheckpointSaver):
+    """Wraps a checkpointer deserializing on the event loop, e.g. ``AsyncSqliteSaver``.
+
+    A ``SqliteBlobStore`` raises ``BlobsNotLoaded`` for blobs it would have
+    to read from the database; the wrapper loads them with ``aload`` in the
+    store's reader thread and reads the checkpoint again. A read served
+    from the cache costs nothing extra.
+    """
+
+    def __init__(self, saver: BaseCheckpointSaver) -> None:
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+
+    @property
+    def config_specs(self) -> list:
+        return self.saver.config_specs
+
+    def get_next_version(self, current: Optional[Any], channel: Any) -> Any:
+        return self.saver.get_next_version(current, channel)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        loaded: Set[bytes] = set()
+        while True:
+            try:
+                return await self.saver.aget_tuple(config)
+            except BlobsNotLoaded as e:
+                await self._aload(e, loaded)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        loaded: Set[bytes] = set()
+        while True:
+            try:
+                # Checkpoints are listed newest first, a retry continues before the last one returned.
+                async for item in self.saver.alist(config, filter=filter, before=before, limit=limit):
+                    yield item
+                    before = item.config
+                    if limit is not None:
+                        limit -= 1
+                        if limit == 0:
+                            return
+                return
+            except BlobsNotLoaded as e:
+                await self._aload(e, loaded)
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await self.saver.aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await self.saver.aput_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.saver.adelete_thread(thread_id)
+
+    # The synchronous API is called off the event loop, the saver still deserializes on its loop
+    # and raises BlobsNotLoaded there, but this thread may block on reading the blobs.
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        loaded: Set[bytes] = set()
+        while True:
+            try:
+                return self.saver.get_tuple(config)
+            except BlobsNotLoaded as e:
+                self._check_progress(e, loaded)
+                e.blobs.ensure_loaded(e.digests)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        loaded: Set[bytes] = set()
+        while True:
+            try:
+                for item in self.saver.list(config, filter=filter, before=before, limit=limit):
+                    yield item
+                    before = item.config
+                    if limit is not None:
+                        limit -= 1
+                        if limit == 0:
+                            return
+                return
+            except BlobsNotLoaded as e:
+                self._check_progress(e, loaded)
+                e.blobs.ensure_loaded(e.digests)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self.saver.put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self.saver.put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.saver.delete_thread(thread_id)
+
+    @classmethod
+    async def _aload(cls, error: BlobsNotLoaded, loaded: Set[bytes]) -> None:
+        cls._check_progress(error, loaded)
+        await error.blobs.aload(error.digests)
+
+    @staticmethod
+    def _check_progress(error: BlobsNotLoaded, loaded: Set[bytes]) -> None:
+        if error.digests <= loaded:
+            # Evicted again before the retry, the cache is smaller than the checkpoint.
+            raise error
+        loaded |= error.digests
@@ -1,17 +1,96 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import random
+import time
 from typing import Any, Dict, List, Optional
 
 import httpx
+from pydantic import TypeAdapter
 
+from cpr_langgraph_agent.metrics import metrics
 from cpr_langgraph_agent.models import Customer, ConsumptionPoint, Contract, Payment
 
-__all__ = ["AsyncCrmClient", "APIError"]
+__all__ = ["AsyncCrmClient", "APIError", "CircuitBreaker", "CircuitOpenError"]
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Statuses worth another attempt of an idempotent request, other 5xx only count as breaker failures.
+_RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+# Built once, validating a list through an adapter runs entirely in pydantic-core.
+_CONSUMPTION_POINTS = TypeAdapter(List[ConsumptionPoint])
+_CONTRACTS = TypeAdapter(List[Contract])
+_PAYMENTS = TypeAdapter(List[Payment])
 
 
 class APIError(Exception):
     """Raised when the API returns an unsuccessful HTTP status code."""
 
+
+class CircuitOpenError(APIError):
+    """Raised without sending a request while the circuit breaker of the endpoint is open."""
+
+
+class CircuitBreaker:
+    """Fails fast while an endpoint keeps failing.
+
+    Opens after ``failure_threshold`` consecutive failures (connection
+    errors, timeouts, 429 and 5xx responses), rejects calls for
+    ``reset_timeout`` seconds and then lets a single trial call through:
+    its success closes the breaker, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._trial = False
+
+    def allow(self) -> bool:
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._trial:
+                self.rejected += 1
+                return False
+            self._trial = True
+        return True
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self._trial = False
+
+    def record_failure(self) -> bool:
+        """Count a failed call, returns whether it opened the breaker."""
+        self.failures += 1
+        self._trial = False
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+            return True
+        return False
+
+    def release(self) -> None:
+        """Forget a call that ended without a result (cancelled), a trial call may be retried."""
+        self._trial = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {'state': self.state, 'consecutive_failures': self.failures, 'rejected': self.rejected}
+
+
 class AsyncCrmClient:
     """Asynchronous client for the Mock REST server REST API."""
 
@@ -21,6 +100,14 @@ class AsyncCrmClient:
         *,
         timeout: float | httpx.Timeout = 10,
         headers: Optional[dict[str, str]] = None,
+        limits: Optional[httpx.Limits] = None,
+        http2: bool = False,
+        max_retries: int = 2,
+        retry_backoff: float = 0.1,
+        max_retry_backoff: float = 2.0,
+        breaker_failures: int = 5,
+        breaker_reset_timeout: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
     ) -> None:
         """Create a new client instance.
 
@@ -33,10 +120,41 @@ class AsyncCrmClient:
         headers:
             Optional default headers added to every outgoing request (for
             example authentication tokens).
+        limits:
+            Optional connection pool limits of ``httpx.AsyncClient``, e.g. a
+            longer ``keepalive_expiry`` to keep warmed-up connections open.
+        http2:
+            Multiplex the requests over HTTP/2 connections when the server
+            supports it, needs the ``h2`` package (``httpx[http2]``).
+        max_retries:
+            Retries of a GET request after a connection error, timeout or a
+            429/502/503/504 response, within the request ``timeout``.
+        retry_backoff, max_retry_backoff:
+            Base and cap in seconds of the exponential backoff between
+            retries, the actual delay is drawn uniformly below it (full jitter).
+        breaker_failures, breaker_reset_timeout:
+            Consecutive failures opening the circuit breaker of an endpoint
+            and seconds it stays open, see ``CircuitBreaker``.
+        transport:
+            Optional transport of ``httpx.AsyncClient`` replacing the
+            connection pool, e.g. ``httpx.ASGITransport`` in tests.
         """
         self._base_url = base_url.rstrip("/")
+        self._timeout = timeout
+        self._limits = limits
+        self._http2 = http2
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+        self._max_retry_backoff = max_retry_backoff
+        self._breaker_failures = breaker_failures
+        self._breaker_reset_timeout = breaker_reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._in_flight = 0
+        client_kwargs: Dict[str, Any] = {} if limits is None else {"limits": limits}
+        if transport is not None:
+            client_kwargs["transport"] = transport
         self._client = httpx.AsyncClient(
-            base_url=self._base_url, timeout=timeout, headers=headers
+            base_url=self._base_url, timeout=timeout, headers=headers, http2=http2, **client_kwargs
         )
 
     # ---------------------------------------------------------------------
@@ -52,46 +170,142 @@ class AsyncCrmClient:
         """Close the underlying ``httpx.AsyncClient`` instance."""
         await self._client.aclose()
 
+    async def warmup(self, *, timeout: Optional[float] = None) -> None:
+        """Open a pooled connection to the server (TCP and TLS) ahead of the first request.
+
+        Any HTTP response will do, the status code is not checked.
+        """
+        await self._client.request(
+            "HEAD", "/", timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        )
+
     # ---------------------------------------------------------------------
     # Internal routine
     # ---------------------------------------------------------------------
+    def _breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(self._breaker_failures, self._breaker_reset_timeout)
+        return breaker
+
+    def _attempt_timeout(self, deadline: Optional[float]) -> Any:
+        if deadline is None:
+            return httpx.USE_CLIENT_DEFAULT
+        remaining = max(deadline - time.monotonic(), 0.001)
+        return min(remaining, self._timeout) if isinstance(self._timeout, (int, float)) else remaining
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None and retry_after.isdigit():
+            return float(retry_after)
+        return random.uniform(0, min(self._max_retry_backoff, self._retry_backoff * 2 ** attempt))
+
     async def _request(
         self,
         method: str,
         url: str,
         *,
+        endpoint: Optional[str] = None,
         params: Optional[Dict[str, Any]] = None,
-    ) -> Any:
-        """Perform an HTTP request and return parsed response data."""
-        response = await self._client.request(method, url, params=params)
-        if response.is_error:
-            raise APIError(f"{response.status_code} {response.text}")
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        """Perform an HTTP request and return the successful response.
 
-        # Attempt to parse JSON automatically; otherwise return raw text.
-        if "application/json" in response.headers.get("content-type", ""):
-            return response.json()
-        return response.text
+        ``timeout`` is the time left until the request deadline, it shortens
+        the client timeout of every attempt and bounds the retries. Only GET
+        requests are retried. ``endpoint`` (the route template) selects the
+        circuit breaker; while it is open ``CircuitOpenError`` is raised at
+        once, so the agent goes on with the data it already has.
+        """
+        endpoint = endpoint or url
+        breaker = self._breaker(endpoint)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        attempts = 1 + (self._max_retries if method == "GET" else 0)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                metrics.increment("crm_circuit_rejected", endpoint=endpoint)
+                raise CircuitOpenError(f"CRM endpoint {endpoint} is temporarily unavailable, continue with the data already loaded")
+            response: Optional[httpx.Response] = None
+            self._in_flight += 1
+            try:
+                response = await self._client.request(method, url, params=params, timeout=self._attempt_timeout(deadline))
+            except httpx.TransportError as e:
+                error: Exception = e
+                retryable = True
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                if response.status_code < 500 and response.status_code != 429:
+                    breaker.record_success()
+                    if response.is_error:
+                        raise APIError(f"{response.status_code} {response.text}")
+                    return response
+                error = APIError(f"{response.status_code} {response.text}")
+                retryable = response.status_code in _RETRY_STATUSES
+            finally:
+                self._in_flight -= 1
+            if breaker.record_failure():
+                logger.warning("Circuit breaker of CRM endpoint %s opened after %r", endpoint, error)
+                metrics.increment("crm_circuit_opened", endpoint=endpoint)
+            delay = self._retry_delay(attempt, response)
+            if (
+                not retryable
+                or attempt + 1 >= attempts
+                or delay > self._max_retry_backoff
+                or (deadline is not None and time.monotonic() + delay >= deadline)
+            ):
+                raise error
+            metrics.increment("crm_retries", endpoint=endpoint)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Connection pool usage and circuit breaker states."""
+        # httpx does not expose its httpcore pool publicly; the stats degrade to zeros if that changes.
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", None) or [])
+        limits = self._limits
+        return {
+            'http2': self._http2,
+            'in_flight_requests': self._in_flight,
+            'connections': len(connections),
+            'idle_connections': sum(1 for connection in connections if connection.is_idle()),
+            'max_connections': limits.max_connections if limits is not None else None,
+            'max_keepalive_connections': limits.max_keepalive_connections if limits is not None else None,
+            'keepalive_expiry': limits.keepalive_expiry if limits is not None else None,
+            'breakers': {endpoint: breaker.stats() for endpoint, breaker in sorted(self._breakers.items())},
+        }
 
     # ---------------------------------------------------------------------
     # Auto‑generated endpoint helpers (all GET in this spec)
+    #
+    # The response bytes are validated directly into the models, without an
+    # intermediate ``response.json()`` dict.
     # ---------------------------------------------------------------------
 
-    async def get_customer_by_email(self, email: str) -> Customer:
+    async def get_customer_by_email(self, email: str, *, timeout: Optional[float] = None) -> Customer:
         """GET ``/customers/by_email``.
 
         Parameters
         ----------
         email: str
             Customer e‑mail address (required).
+        timeout: float | None
+            Optional timeout of this request in seconds.
         """
-        response = await self._request("GET", "/customers/by_email", params={"email": email})
-        return Customer(**response)
+        response = await self._request(
+            "GET", "/customers/by_email", endpoint="/customers/by_email", params={"email": email}, timeout=timeout
+        )
+        return Customer.model_validate_json(response.content)
 
     async def get_customer_consumption_points(
         self,
         customer_id: int,
         *,
         product_family: Optional[str] = None,
+        timeout: Optional[float] = None,
     ) -> List[ConsumptionPoint]:
         """GET ``/customers/{customer_id}/consumption_points``.
 
@@ -101,6 +315,8 @@ class AsyncCrmClient:
             Numeric customer identifier.
         product_family: str | None
             Optional product family filter.
+        timeout: float | None
+            Optional timeout of this request in seconds.
         """
         params: Dict[str, Any] = {}
         if product_family is not None:
@@ -109,29 +325,39 @@ class AsyncCrmClient:
         response = await self._request(
             "GET",
             f"/customers/{customer_id}/consumption_points",
+            endpoint="/customers/{customer_id}/consumption_points",
             params=params or None,
+            timeout=timeout,
         )
-        return [ConsumptionPoint(**item) for item in response]
+        return _CONSUMPTION_POINTS.validate_json(response.content)
 
     async def get_customer_contracts(
         self,
-        customer_id: str
+        customer_id: str,
+        *,
+        timeout: Optional[float] = None,
     ) -> List[Contract]:
         """GET ``/customers/{customer_id}/contracts``."""
         response = await self._request(
             "GET",
             f"/customers/{customer_id}/contracts",
+            endpoint="/customers/{customer_id}/contracts",
+            timeout=timeout,
         )
-        return [Contract(**item) for item in response]
+        return _CONTRACTS.validate_json(response.content)
 
     async def get_contract_payments(
         self,
         customer_id: str,
         contract_id: str,
+        *,
+        timeout: Optional[float] = None,
     ) -> List[Payment]:
         """GET ``/customers/customer/{customer_id}/contracts/{contract_id}/payments``."""
         response = await self._request(
             "GET",
             f"/customers/customer/{customer_id}/contracts/{contract_id}/payments",
+            endpoint="/customers/customer/{customer_id}/contracts/{contract_id}/payments",
+            timeout=timeout,
         )
-        return [Payment(**item) for item in response]
\ No newline at end of file
+        return _PAYMENTS.validate_json(response.content)
\ No newline at end of file
@@ -1,8 +1,8 @@
 from typing import Annotated, List, Optional
-import json
 
-from langchain_core.messages import ToolMessage, SystemMessage
+from langchain_core.messages import ToolMessage
 from langchain_core.tools import InjectedToolCallId
+from langchain_core.runnables import RunnableConfig
 
 from langchain_openai import AzureChatOpenAI
 
@@ -14,6 +14,9 @@ from langchain_community.vectorstores.azuresearch import AzureSearch
 
 from cpr_langgraph_agent.crm_client import AsyncCrmClient
 from cpr_langgraph_agent.state_models import AgentStateModel
+from cpr_langgraph_agent.prefetch import get_prefetch
+from cpr_langgraph_agent.deadline import remaining_timeout
+from cpr_langgraph_agent.prompt_layout import llm_input
 from cpr_langgraph_agent.data_agent_prompts import AGENT_PROMPT
 
 class DataAgent:
@@ -36,25 +39,14 @@ class DataAgent:
             f.write(self.agent.get_graph().draw_mermaid_png())
         self.crm_client = crm_client
     
-    async def pre_model_hook(self, state: AgentStateModel):
-        content = state.model_dump(include={
-                    'incoming_ticket', 
-                    'customer',
-                    'consumption_points',
-                    'contracts',
-                    'payments',
-                })
-        state_data = SystemMessage(content=f'Following are the CURRENT DATA provided by the tools and user: \n {json.dumps(content, indent=4, ensure_ascii=False)}')
-        output = {
-            "llm_input_messages": [*state.messages, state_data]
-        }
-        return output
+    async def pre_model_hook(self, state: AgentStateModel, config: RunnableConfig):
+        return await llm_input('data_agent', AGENT_PROMPT, state, config, channels=('customer', 'consumption_points', 'contracts', 'payments'))
 
-    async def get_customer_by_email(self, tool_call_id: Annotated[str, InjectedToolCallId], state: Annotated[AgentStateModel, InjectedState]) -> Command:
+    async def get_customer_by_email(self, tool_call_id: Annotated[str, InjectedToolCallId], state: Annotated[AgentStateModel, InjectedState], config: RunnableConfig) -> Command:
         """
         Use this tool to retrieve customer details from CRM.
         """
-        customer = await self.crm_client.get_customer_by_email(state.incoming_ticket.email)
+        customer = await (get_prefetch(config) or self.crm_client).get_customer_by_email(state.incoming_ticket.email, timeout=remaining_timeout(config))
         return Command(update={
             'customer': customer,
             'messages': [
@@ -62,13 +54,13 @@ class DataAgent:
             ]
         })
     
-    async def get_customer_consumption_points(self, tool_call_id: Annotated[str, InjectedToolCallId], state: Annotated[AgentStateModel, InjectedState], product_family: Optional[str] = None) -> Command:
+    async def get_customer_consumption_points(self, tool_call_id: Annotated[str, InjectedToolCallId], state: Annotated[AgentStateModel, InjectedState], config: RunnableConfig, product_family: Optional[str] = None) -> Command:
         """
         Use this tool to retrieve customer consumption points.
         Optionally you can filter consumption points by product family ('electricity' or 'gas') based on the incoming ticket contents
         """
         if state.customer:
-            consumption_points = await self.crm_client.get_customer_consumption_points(state.customer.customer_id, product_family=product_family)
+            consumption_points = await (get_prefetch(config) or self.crm_client).get_customer_consumption_points(state.customer.customer_id, product_family=product_family, timeout=remaining_timeout(config))
             return Command(update={
                 'consumption_points': consumption_points,
                 'messages': [
@@ -76,12 +68,12 @@ class DataAgent:
                 ]
             })
 
-    async def get_customer_contracts(self, tool_call_id: Annotated[str, InjectedToolCallId], state: Annotated[AgentStateModel, InjectedState]) -> Command:
+    async def get_customer_contracts(self, tool_call_id: Annotated[str, InjectedToolCallId], state: Annotated[AgentStateModel, InjectedState], config: RunnableConfig) -> Command:
         """
         Use this tool to retrieve customer contracts
         """
         if state.customer:
-            contracts = await self.crm_client.get_customer_contracts(state.customer.customer_id)
+            contracts = await (get_prefetch(config) or self.crm_client).get_customer_contracts(state.customer.customer_id, timeout=remaining_timeout(config))
             return Command(update={
                 'contracts': contracts,
                 'messages': [
@@ -89,12 +81,12 @@ class DataAgent:
                 ]
             })
     
-    async def get_contract_payments(self, tool_call_id: Annotated[str, InjectedToolCallId], state: Annotated[AgentStateModel, InjectedState], contract_ids: List[str]) -> Command:
+    async def get_contract_payments(self, tool_call_id: Annotated[str, InjectedToolCallId], state: Annotated[AgentStateModel, InjectedState], config: RunnableConfig, contract_ids: List[str]) -> Command:
         """
         Use this tool to retrieve contract payments by contract id. 
         """
         if state.customer:
-            payments = [await self.crm_client.get_contract_payments(state.customer.customer_id, contract_id) for contract_id in contract_ids]
+            payments = [await self.crm_client.get_contract_payments(state.customer.customer_id, contract_id, timeout=remaining_timeout(config)) for contract_id in contract_ids]
             return Command(update={
                 'payments': payments,
                 'messages': [
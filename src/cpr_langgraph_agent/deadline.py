@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Optional
+
+from langchain_core.runnables import RunnableConfig
+
+__all__ = [
+    "Deadline",
+    "DeadlineExceeded",
+    "DEFAULT_SEARCH_TIMEOUT",
+    "get_deadline",
+    "remaining_timeout",
+]
+
+DEFAULT_SEARCH_TIMEOUT = 10.0
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when there is no time left for a downstream call."""
+
+
+class Deadline:
+    """Point in (monotonic) time by which a request has to be answered."""
+
+    def __init__(self, expires_at: float) -> None:
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """Timeout for a downstream call: the remaining budget, at most ``cap``."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+        return remaining if cap is None else min(cap, remaining)
+
+
+def get_deadline(config: Optional[RunnableConfig]) -> Optional[Deadline]:
+    return (config or {}).get("configurable", {}).get("deadline")
+
+
+def remaining_timeout(config: Optional[RunnableConfig], cap: Optional[float] = None) -> Optional[float]:
+    """Timeout derived from the request deadline in ``config``, ``cap`` when there is none."""
+    deadline = get_deadline(config)
+    if deadline is None:
+        return cap
+    return deadline.timeout(cap)
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+
+from cpr_langgraph_agent.metrics import metrics
+from cpr_langgraph_agent.usage import UsageTracker
+
+__all__ = ["GuardLimits", "RunGuard", "get_guard", "guard_messages"]
+
+DATA_CHANNELS = ('customer', 'consumption_points', 'contracts', 'payments', 'similar_tickets')
+
+REPEATED_CALL_MESSAGE = (
+    'The tool {name} was already called with the same arguments and its result is in the CURRENT DATA. '
+    'Do not call it again, use the data you have or a different tool.'
+)
+NO_PROGRESS_MESSAGE = (
+    'The last tool calls did not add any new data. Check the CURRENT DATA for what is missing '
+    '(customer details have to be loaded before consumption points, contracts and payments) '
+    'or draft the reply with the data you have.'
+)
+FINAL_MESSAGE = (
+    'The processing budget for this ticket is used up ({reason}). Do not call any more tools. '
+    'Write the final draft reply now, based only on the CURRENT DATA.'
+)
+
+
+@dataclass
+class GuardLimits:
+    max_repeated_tool_calls: int = 2
+    max_no_progress_turns: int = 2
+    max_steps: int = 15
+    max_tokens: int = 150_000
+    max_wall_seconds: float = 90.0
+
+    @classmethod
+    def from_env(cls) -> "GuardLimits":
+        return cls(
+            max_repeated_tool_calls=int(os.getenv("GUARD_MAX_REPEATED_TOOL_CALLS", cls.max_repeated_tool_calls)),
+            max_no_progress_turns=int(os.getenv("GUARD_MAX_NO_PROGRESS_TURNS", cls.max_no_progress_turns)),
+            max_steps=int(os.getenv("GUARD_MAX_STEPS", cls.max_steps)),
+            max_tokens=int(os.getenv("GUARD_MAX_TOKENS", cls.max_tokens)),
+            max_wall_seconds=float(os.getenv("GUARD_MAX_WALL_SECONDS", cls.max_wall_seconds)),
+        )
+
+
+def _current_run(messages: Sequence[BaseMessage]) -> Sequence[BaseMessage]:
+    """Messages since the last human message, earlier runs on the thread are not counted."""
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return messages[i + 1:]
+    return messages
+
+
+def _tool_call_signature(tool_call: Dict[str, Any]) -> str:
+    return f"{tool_call['name']}:{json.dumps(tool_call.get('args', {}), sort_keys=True, ensure_ascii=False)}"
+
+
+class RunGuard:
+    """Per-request protection of the ReAct loops against runaway runs.
+
+    Consulted by the ``pre_model_hook`` of every agent before each LLM call.
+    Repeated identical tool calls and tool turns that add no data get a
+    corrective message first. Once a loop persists, or the step, token or
+    wall time budget of the request is spent, the guard switches to final
+    mode: the model is told to draft the reply and ``AgentChatModel`` stops
+    offering it tools.
+    """
+
+    def __init__(self, limits: Optional[GuardLimits] = None, usage: Optional[UsageTracker] = None) -> None:
+        self.limits = limits or GuardLimits()
+        self.usage = usage
+        self.started = time.monotonic()
+        self.steps = 0
+        self.terminated: Optional[str] = None
+        self.corrections: Counter[str] = Counter()
+        self._fingerprints: Dict[str, str] = {}
+        self._no_progress: Counter[str] = Counter()
+
+    def before_model(self, agent: str, state: Any) -> List[BaseMessage]:
+        """Account for one LLM call of ``agent`` and return messages to append to its input."""
+        self.steps += 1
+        run = _current_run(state.messages)
+        messages: List[BaseMessage] = []
+
+        repeated = Counter(
+            _tool_call_signature(tool_call)
+            for message in run if isinstance(message, AIMessage)
+            for tool_call in message.tool_calls
+        )
+        signature, count = repeated.most_common(1)[0] if repeated else ('', 0)
+        last_ai = next((m for m in reversed(run) if isinstance(m, AIMessage)), None)
+        just_repeated = last_ai is not None and signature in {_tool_call_signature(c) for c in last_ai.tool_calls}
+        if count > self.limits.max_repeated_tool_calls:
+            self._terminate(agent, 'repeated_tool_call')
+        elif count == self.limits.max_repeated_tool_calls and just_repeated:
+            self._correct(agent, 'repeated_tool_call')
+            messages.append(SystemMessage(REPEATED_CALL_MESSAGE.format(name=signature.split(':', 1)[0])))
+
+        fingerprint = hashlib.blake2b(
+            state.model_dump_json(include=set(DATA_CHANNELS)).encode(), digest_size=16
+        ).hexdigest()
+        tools_ran = bool(run) and isinstance(run[-1], ToolMessage)
+        if tools_ran and self._fingerprints.get(agent) == fingerprint:
+            self._no_progress[agent] += 1
+        else:
+            self._no_progress[agent] = 0
+        self._fingerprints[agent] = fingerprint
+        if self._no_progress[agent] >= self.limits.max_no_progress_turns:
+            self._terminate(agent, 'no_progress')
+        elif self._no_progress[agent]:
+            self._correct(agent, 'no_progress')
+            messages.append(SystemMessage(NO_PROGRESS_MESSAGE))
+
+        if self.steps > self.limits.max_steps:
+            self._terminate(agent, 'step_budget')
+        if self.usage is not None and self.usage.total_tokens >= self.limits.max_tokens:
+            self._terminate(agent, 'token_budget')
+        if time.monotonic() - self.started >= self.limits.max_wall_seconds:
+            self._terminate(agent, 'time_budget')
+
+        if self.terminated:
+            return [SystemMessage(FINAL_MESSAGE.format(reason=self.terminated.replace('_', ' ')))]
+        return messages
+
+    def _correct(self, agent: str, reason: str) -> None:
+        self.corrections[reason] += 1
+        metrics.increment("agent_corrections", agent=agent, reason=reason)
+
+    def _terminate(self, agent: str, reason: str) -> None:
+        if self.terminated is None:
+            self.terminated = reason
+            metrics.increment("agent_terminations", agent=agent, reason=reason)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'steps': self.steps,
+            'terminated': self.terminated,
+            'corrections': dict(self.corrections),
+        }
+
+
+def get_guard(config: Optional[RunnableConfig]) -> Optional[RunGuard]:
+    return (config or {}).get("configurable", {}).get("guard")
+
+
+def guard_messages(config: Optional[RunnableConfig], agent: str, state: Any) -> List[BaseMessage]:
+    """Messages the guard of the current request appends to the LLM input of ``agent``."""
+    guard = get_guard(config)
+    if guard is None:
+        return []
+    return guard.before_model(agent, state)
@@ -0,0 +1,31 @@
+from azure.search.documents.indexes.models import (
+    SearchField, SearchFieldDataType, SimpleField, SearchableField
+)
+
+fields = [
+    SimpleField( name="id", type=SearchFieldDataType.String, key=True, filterable=True ),
+    SearchableField( name="ticket_id", type=SearchFieldDataType.String, filterable=True ),
+    SearchableField( name="category_1", type=SearchFieldDataType.String, filterable=True),
+    SearchableField( name="category_2", type=SearchFieldDataType.String, filterable=True),
+    SearchableField( name="category_3", type=SearchFieldDataType.String, filterable=True ),
+    SearchableField( name="status", type=SearchFieldDataType.String, filterable=True ),
+    SearchableField( name="created_by", type=SearchFieldDataType.String, filterable=True ),
+    SearchableField( name="eic", type=SearchFieldDataType.String, filterable=True ),
+    SearchableField( name="email", type=SearchFieldDataType.String, filterable=True ),
+    SearchableField( name="request_content", type=SearchFieldDataType.String ),
+    SearchableField( name="response_content", type=SearchFieldDataType.String ),
+    SearchField(   name="request_embedding",
+                   type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
+                   searchable=True,
+                   vector_search_dimensions=3072,
+                   vector_search_profile_name="request_embedding_profile" ),
+    SearchableField( name="filename", type=SearchFieldDataType.String, filterable=True ),
+    SearchableField( name="source_uri", type=SearchFieldDataType.String, filterable=True ),
+    SimpleField( name="index_datetime", type=SearchFieldDataType.DateTimeOffset, filterable=True),
+    SimpleField( name="deleted", type=SearchFieldDataType.Boolean, filterable=True),
+    SearchableField( name="key_phrases", type=SearchFieldDataType.Collection(SearchFieldDataType.String), searchable=True, filterable=True),
+    SearchableField( name="entities", type=SearchFieldDataType.Collection(SearchFieldDataType.String), searchable=True, filterable=True),
+]
+
+# Soft deleted documents stay in the index until the next rebuild, every query has to skip them.
+ACTIVE_DOCUMENTS_FILTER = "deleted ne true"
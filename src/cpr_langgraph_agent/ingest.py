@@ -0,0 +1,521 @@
+"""Bulk ingestion of claim tickets into the claims search index.
+
+Tickets are streamed from a JSONL or CSV export, embedded in batches and
+uploaded with ``merge_or_upload`` so the same export can be replayed safely.
+Progress is checkpointed after every uploaded window, an interrupted run
+continues where it stopped.
+
+Usage::
+
+    python -m cpr_langgraph_agent.ingest tickets.jsonl
+    python -m cpr_langgraph_agent.ingest tickets.csv --target local --local-index claims_index.jsonl
+    python -m cpr_langgraph_agent.ingest changes.jsonl --incremental
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+from dotenv import load_dotenv
+from pydantic import ValidationError
+
+from langchain_core.embeddings import Embeddings
+
+from cpr_langgraph_agent.models import ClaimRecord
+
+__all__ = [
+    "IngestCheckpoint",
+    "IngestStats",
+    "IngestionPipeline",
+    "IndexingResult",
+    "LocalSearchIndex",
+    "read_records",
+]
+
+logger = logging.getLogger(__name__)
+
+LIST_SEPARATOR = ";"
+
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in {"1", "true", "yes", "y"}
+
+
+def _read_csv(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open(newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            record: Dict[str, Any] = {k: v for k, v in row.items() if v not in (None, "")}
+            for name in ("key_phrases", "entities"):
+                if name in record:
+                    record[name] = [item.strip() for item in record[name].split(LIST_SEPARATOR) if item.strip()]
+            if "deleted" in record:
+                record["deleted"] = _parse_bool(record["deleted"])
+            yield record
+
+
+def _read_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def read_records(path: str | Path) -> Iterator[Dict[str, Any]]:
+    """Stream raw ticket records from a ``.jsonl`` or ``.csv`` file.
+
+    CSV list columns (``key_phrases``, ``entities``) are separated by ``;``.
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        return _read_csv(path)
+    return _read_jsonl(path)
+
+
+# ---------------------------------------------------------------------------
+# Targets
+# ---------------------------------------------------------------------------
+
+@dataclass
+class IndexingResult:
+    """Mirror of ``azure.search.documents.models.IndexingResult``."""
+
+    key: str
+    succeeded: bool
+    error_message: Optional[str] = None
+
+
+class LocalSearchIndex:
+    """Local stand-in for the Azure AI Search index.
+
+    Documents are kept in memory and every ``merge_or_upload`` batch is
+    appended to a JSONL file, which is folded back into documents on load.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self._path = Path(path)
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        if self._path.exists():
+            for document in _read_jsonl(self._path):
+                self.documents.setdefault(document["id"], {}).update(document)
+
+    async def merge_or_upload_documents(self, documents: List[Dict[str, Any]]) -> List[IndexingResult]:
+        await asyncio.to_thread(self._append, documents)
+        for document in documents:
+            self.documents.setdefault(document["id"], {}).update(document)
+        return [IndexingResult(key=document["id"], succeeded=True) for document in documents]
+
+    def _append(self, documents: List[Dict[str, Any]]) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with self._path.open("a", encoding="utf-8") as f:
+            for document in documents:
+                f.write(json.dumps(document, ensure_ascii=False))
+                f.write("\n")
+
+    async def close(self) -> None:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Checkpoint
+# ---------------------------------------------------------------------------
+
+def _fingerprint(source: str) -> List[int]:
+    stat = os.stat(source)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+@dataclass
+class IngestCheckpoint:
+    """Resume position, ``index_datetime`` watermark and failed record ids per source file.
+
+    The position only outlives an interrupted run and is bound to the size
+    and modification time of the file it was reached in; a completed run
+    clears it, so a regenerated export is read from its start again.
+    """
+
+    path: Path
+    offsets: Dict[str, int] = field(default_factory=dict)
+    files: Dict[str, List[int]] = field(default_factory=dict)
+    watermarks: Dict[str, datetime] = field(default_factory=dict)
+    failed: Dict[str, List[str]] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "IngestCheckpoint":
+        path = Path(path)
+        if not path.exists():
+            return cls(path=path)
+        data = json.loads(path.read_text(encoding="utf-8"))
+        offsets = data.get("offsets", {})
+        watermarks = {source: datetime.fromisoformat(value) for source, value in data.get("watermarks", {}).items()}
+        if data.get("watermark"):
+            # Checkpoints written before the watermark was kept per source.
+            watermarks = {source: datetime.fromisoformat(data["watermark"]) for source in offsets} | watermarks
+        return cls(
+            path=path, offsets=offsets, files=data.get("files", {}), watermarks=watermarks, failed=data.get("failed", {}),
+        )
+
+    def offset(self, source: str) -> int:
+        return self.offsets.get(source, 0)
+
+    def resume(self, source: str) -> int:
+        """Position to resume ``source`` from, 0 unless an interrupted run read this very file."""
+        fingerprint = _fingerprint(source)
+        if self.offset(source) and self.files.get(source) != fingerprint:
+            logger.warning("%s changed since the interrupted run, reading it from the start", source)
+            self.offsets.pop(source)
+        self.files[source] = fingerprint
+        return self.offset(source)
+
+    def finish(self, source: str) -> None:
+        """Forget the position of a completed run, the watermark and failed ids are kept."""
+        self.offsets.pop(source, None)
+        self.files.pop(source, None)
+        self.save()
+
+    def watermark(self, source: str) -> Optional[datetime]:
+        return self.watermarks.get(source)
+
+    def failed_keys(self, source: str) -> Set[str]:
+        """Ids of the records of ``source`` whose indexing failed, they are retried by the next run."""
+        return set(self.failed.get(source, ()))
+
+    def advance(
+        self,
+        source: str,
+        offset: int,
+        watermark: Optional[datetime],
+        succeeded: Iterable[str] = (),
+        failed: Iterable[str] = (),
+    ) -> None:
+        """Record an uploaded window: the position reached, its watermark and the keys that failed or were retried successfully."""
+        self.offsets[source] = max(offset, self.offset(source))
+        if watermark is not None and (source not in self.watermarks or watermark > self.watermarks[source]):
+            self.watermarks[source] = watermark
+        keys = (self.failed_keys(source) - set(succeeded)) | set(failed)
+        if keys:
+            self.failed[source] = sorted(keys)
+        else:
+            self.failed.pop(source, None)
+        self.save()
+
+    def reset(self, source: str) -> None:
+        self.offsets.pop(source, None)
+        self.files.pop(source, None)
+        self.failed.pop(source, None)
+        self.save()
+
+    def save(self) -> None:
+        data = {
+            "offsets": self.offsets,
+            "files": self.files,
+            "watermarks": {source: value.isoformat() for source, value in self.watermarks.items()},
+            "failed": self.failed,
+        }
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+
+@dataclass
+class IngestStats:
+    uploaded: int = 0
+    deleted: int = 0
+    skipped: int = 0
+    invalid: int = 0
+    failed: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def docs_per_second(self) -> float:
+        return (self.uploaded + self.deleted) / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"uploaded={self.uploaded} deleted={self.deleted} skipped={self.skipped} "
+            f"invalid={self.invalid} failed={self.failed} "
+            f"elapsed={self.elapsed:.1f}s rate={self.docs_per_second:.1f} docs/s"
+        )
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class IngestionPipeline:
+    """Embeds and uploads claim records into a search index client.
+
+    The source is processed in windows of ``embed_batch_size * concurrency``
+    records. Embedding of a window overlaps with the upload of the previous
+    one and the checkpoint only moves once a window is uploaded. Records the
+    index rejected are kept in the checkpoint and uploaded again by the
+    next run, whatever its offset and watermark.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        index_client: Any,
+        checkpoint: IngestCheckpoint,
+        *,
+        embed_batch_size: int = 256,
+        upload_batch_size: int = 250,
+        concurrency: int = 4,
+        incremental: bool = False,
+    ) -> None:
+        """Create a new pipeline.
+
+        Parameters
+        ----------
+        embeddings:
+            Embedding model used for the ``request_embedding`` vector field.
+        index_client:
+            Async client exposing ``merge_or_upload_documents``, either
+            ``azure.search.documents.aio.SearchClient`` or ``LocalSearchIndex``.
+        checkpoint:
+            Checkpoint used to resume interrupted runs.
+        embed_batch_size:
+            Number of texts sent in a single embedding request.
+        upload_batch_size:
+            Number of documents in a single upload request. Azure AI Search
+            accepts at most 1000 documents and 16 MB per request.
+        concurrency:
+            Maximum number of embedding or upload requests in flight.
+        incremental:
+            Skip records whose ``index_datetime`` is not newer than the
+            watermark stored in the checkpoint for the source.
+        """
+        self._embeddings = embeddings
+        self._index_client = index_client
+        self._checkpoint = checkpoint
+        self._embed_batch_size = embed_batch_size
+        self._upload_batch_size = upload_batch_size
+        self._incremental = incremental
+        self._watermark: Optional[datetime] = None
+        self._retry: Set[str] = set()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._window_size = embed_batch_size * concurrency
+
+    async def run(self, source: str | Path) -> IngestStats:
+        source = str(Path(source).resolve())
+        stats = IngestStats()
+        # Records of this run must not be compared with the watermark the run itself moves.
+        self._watermark = self._checkpoint.watermark(source)
+        self._retry = self._checkpoint.failed_keys(source)
+        offset = self._checkpoint.resume(source)
+        if offset:
+            logger.info("Resuming %s from record %d", source, offset)
+        if self._retry:
+            logger.info("Retrying %d records of %s that failed before", len(self._retry), source)
+
+        pending: Optional[asyncio.Task] = None
+        window: List[ClaimRecord] = []
+        position = 0
+        for position, raw in enumerate(read_records(source), start=1):
+            if position <= offset and str(raw.get("id")) not in self._retry:
+                continue
+            try:
+                record = ClaimRecord.model_validate(raw)
+            except ValidationError as e:
+                stats.invalid += 1
+                logger.warning("Skipping invalid record %d: %s", position, e)
+                continue
+            if self._is_unchanged(record):
+                stats.skipped += 1
+                continue
+            window.append(record)
+            if len(window) >= self._window_size:
+                pending = await self._process_window(source, window, position, pending, stats)
+                window = []
+
+        pending = await self._process_window(source, window, position, pending, stats)
+        if pending is not None:
+            await pending
+        self._checkpoint.finish(source)
+        return stats
+
+    def _is_unchanged(self, record: ClaimRecord) -> bool:
+        watermark = self._watermark
+        if not self._incremental or watermark is None or record.index_datetime is None or record.id in self._retry:
+            return False
+        return _as_utc(record.index_datetime) <= _as_utc(watermark)
+
+    async def _process_window(
+        self,
+        source: str,
+        window: List[ClaimRecord],
+        position: int,
+        pending: Optional[asyncio.Task],
+        stats: IngestStats,
+    ) -> asyncio.Task:
+        documents = await self._build_documents(window)
+        if pending is not None:
+            await pending
+        return asyncio.create_task(self._upload_window(source, window, documents, position, stats))
+
+    async def _build_documents(self, window: List[ClaimRecord]) -> List[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        upserts = [record for record in window if not record.deleted]
+        batches = [upserts[i:i + self._embed_batch_size] for i in range(0, len(upserts), self._embed_batch_size)]
+        vectors = await asyncio.gather(*(self._embed(batch) for batch in batches))
+
+        documents = []
+        for batch, batch_vectors in zip(batches, vectors):
+            for record, vector in zip(batch, batch_vectors):
+                document = record.model_dump(mode="json", exclude={"index_datetime", "deleted"})
+                document["ticket_id"] = record.id
+                document["request_embedding"] = vector
+                document["index_datetime"] = _as_utc(record.index_datetime or now).isoformat()
+                document["deleted"] = False
+                documents.append(document)
+        # Soft deletes only flip the flag, there is nothing to embed.
+        for record in window:
+            if record.deleted:
+                documents.append({
+                    "id": record.id,
+                    "deleted": True,
+                    "index_datetime": _as_utc(record.index_datetime or now).isoformat(),
+                })
+        return documents
+
+    async def _embed(self, batch: Sequence[ClaimRecord]) -> List[List[float]]:
+        async with self._semaphore:
+            return await self._embeddings.aembed_documents([record.request_content for record in batch])
+
+    async def _upload_window(
+        self,
+        source: str,
+        window: List[ClaimRecord],
+        documents: List[Dict[str, Any]],
+        position: int,
+        stats: IngestStats,
+    ) -> None:
+        chunks = [documents[i:i + self._upload_batch_size] for i in range(0, len(documents), self._upload_batch_size)]
+        results = await asyncio.gather(*(self._upload(chunk) for chunk in chunks))
+        deleted_ids = {record.id for record in window if record.deleted}
+        succeeded: List[str] = []
+        failed: List[str] = []
+        for result in (r for chunk_results in results for r in chunk_results):
+            if not result.succeeded:
+                stats.failed += 1
+                failed.append(result.key)
+                logger.error("Failed to index %s: %s", result.key, result.error_message)
+                continue
+            succeeded.append(result.key)
+            if result.key in deleted_ids:
+                stats.deleted += 1
+            else:
+                stats.uploaded += 1
+
+        watermark = max((_as_utc(r.index_datetime) for r in window if r.index_datetime), default=None)
+        self._checkpoint.advance(source, position, watermark, succeeded, failed)
+        logger.info("Indexed up to record %d: %s", position, stats)
+
+    async def _upload(self, chunk: List[Dict[str, Any]]) -> List[Any]:
+        async with self._semaphore:
+            try:
+                return await self._index_client.merge_or_upload_documents(documents=chunk)
+            except Exception as e:
+                # A rejected request fails its documents, they are retried by the next run.
+                return [IndexingResult(key=document["id"], succeeded=False, error_message=repr(e)) for document in chunk]
+
+
+# ---------------------------------------------------------------------------
+# Command line
+# ---------------------------------------------------------------------------
+
+def _create_embeddings() -> Embeddings:
+    from langchain_openai import AzureOpenAIEmbeddings
+
+    return AzureOpenAIEmbeddings(
+        api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        azure_deployment=os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"),
+        model=os.getenv("AZURE_OPENAI_EMBEDDING_MODEL_NAME"),
+        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+    )
+
+
+def _create_azure_index(embeddings: Embeddings) -> Any:
+    from langchain_community.vectorstores.azuresearch import AzureSearch
+    from cpr_langgraph_agent.index_schema import fields
+
+    # AzureSearch creates the index with its vector and semantic configuration when it is missing.
+    search = AzureSearch(
+        azure_search_endpoint=os.getenv("AZURE_AI_SEARCH_ENDPOINT"),
+        index_name=os.getenv("AZURE_AI_SEARCH_INDEX_NAME"),
+        azure_search_key=os.getenv("AZURE_AI_SEARCH_API_KEY"),
+        embedding_function=embeddings,
+        semantic_configuration_name=os.getenv("SEMANTIC_CONFIG"),
+        search_type="semantic_hybrid",
+        fields=fields,
+    )
+    return search.async_client
+
+
+async def _main(args: argparse.Namespace) -> IngestStats:
+    embeddings = _create_embeddings()
+    if args.target == "local":
+        index_client = LocalSearchIndex(args.local_index)
+    else:
+        index_client = _create_azure_index(embeddings)
+
+    checkpoint = IngestCheckpoint.load(args.checkpoint)
+    if args.restart:
+        checkpoint.reset(str(Path(args.source).resolve()))
+
+    pipeline = IngestionPipeline(
+        embeddings,
+        index_client,
+        checkpoint,
+        embed_batch_size=args.embed_batch_size,
+        upload_batch_size=args.upload_batch_size,
+        concurrency=args.concurrency,
+        incremental=args.incremental,
+    )
+    try:
+        return await pipeline.run(args.source)
+    finally:
+        await index_client.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Populate or refresh the claims search index.")
+    parser.add_argument("source", help="JSONL or CSV file with tickets")
+    parser.add_argument("--target", choices=("azure", "local"), default="azure")
+    parser.add_argument("--local-index", default="claims_index.jsonl", help="File backing the local index")
+    parser.add_argument("--checkpoint", default="ingest_checkpoint.json")
+    parser.add_argument("--restart", action="store_true", help="Ignore the stored position for this source")
+    parser.add_argument("--incremental", action="store_true", help="Skip records not modified since the last run")
+    parser.add_argument("--embed-batch-size", type=int, default=256)
+    parser.add_argument("--upload-batch-size", type=int, default=250)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    stats = asyncio.run(_main(args))
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
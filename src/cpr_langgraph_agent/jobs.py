@@ -0,0 +1,399 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from cpr_langgraph_agent.metrics import metrics
+from cpr_langgraph_agent.models import Ticket
+
+__all__ = ["Job", "JobStore", "JobWorkerPool"]
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    agent TEXT NOT NULL,
+    ticket_id TEXT NOT NULL,
+    ticket TEXT NOT NULL,
+    ticket_hash TEXT NOT NULL,
+    timeout REAL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    lease_expires REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_ticket ON jobs (ticket_id, finished_at);
+CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (agent, ticket_hash, status);
+"""
+
+_COLUMNS = "id, agent, ticket_id, ticket, timeout, status, attempts, result, error, created_at, started_at, finished_at, lease_expires"
+
+
+def _lease_expired(lease_expires: Optional[float], now: float) -> bool:
+    # Jobs left running by a version without leases have none, their worker is gone as well.
+    return lease_expires is None or lease_expires < now
+
+
+@dataclass
+class Job:
+    id: str
+    agent: str
+    ticket_id: str
+    ticket: Ticket
+    timeout: Optional[float]
+    status: str
+    attempts: int
+    result: Optional[Dict[str, Any]]
+    error: Optional[str]
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+    lease_expires: Optional[float] = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        return cls(
+            id=row['id'],
+            agent=row['agent'],
+            ticket_id=row['ticket_id'],
+            ticket=Ticket.model_validate_json(row['ticket']),
+            timeout=row['timeout'],
+            status=row['status'],
+            attempts=row['attempts'],
+            result=json.loads(row['result']) if row['result'] is not None else None,
+            error=row['error'],
+            created_at=row['created_at'],
+            started_at=row['started_at'],
+            finished_at=row['finished_at'],
+            lease_expires=row['lease_expires'],
+        )
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+
+def _ticket_hash(ticket: Ticket) -> str:
+    return hashlib.blake2b(ticket.model_dump_json().encode(), digest_size=16).hexdigest()
+
+
+class JobStore:
+    """Durable job queue and result store in a local SQLite database.
+
+    Submitting the same ticket to the same agent again returns the job that
+    is queued, running or already succeeded for it, so client retries do not
+    recompute the draft. A claimed job holds a lease of ``lease_seconds``
+    that its worker renews while the job runs; a job whose lease expired
+    (its process stopped or hangs) is claimed again. The ``attempts`` of a
+    claim fence off the previous holder, it can no longer renew, complete
+    or fail the job. The database may be shared by the worker processes of
+    a node, submission and claiming are atomic across processes. All
+    methods are blocking, ``JobWorkerPool`` and the endpoints call them
+    from a worker thread.
+    """
+
+    def __init__(self, path: str = 'jobs.sqlite', lease_seconds: float = 60.0) -> None:
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        # Databases created before job leases, the worker processes starting together must not both add the column.
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            if 'lease_expires' not in {row['name'] for row in self._db.execute("PRAGMA table_info(jobs)")}:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN lease_expires REAL")
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_lease ON jobs (status, lease_expires)")
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def submit(self, agent: str, ticket: Ticket, timeout: Optional[float] = None) -> Job:
+        ticket_hash = _ticket_hash(ticket)
+        now = time.time()
+        with self._lock:
+            # The write lock is taken up front, another worker process cannot insert the same job in between.
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    f"SELECT {_COLUMNS} FROM jobs WHERE agent = ? AND ticket_hash = ? AND status != ? "
+                    "ORDER BY created_at DESC LIMIT 1",
+                    (agent, ticket_hash, FAILED),
+                ).fetchone()
+                if row is not None and row['status'] == RUNNING and _lease_expired(row['lease_expires'], now):
+                    # Its worker is gone, queue it again rather than returning a job nobody runs.
+                    row = self._db.execute(
+                        f"UPDATE jobs SET status = ?, lease_expires = NULL WHERE id = ? RETURNING {_COLUMNS}",
+                        (QUEUED, row['id']),
+                    ).fetchone()
+                if row is None:
+                    row = self._db.execute(
+                        f"INSERT INTO jobs (id, agent, ticket_id, ticket, ticket_hash, timeout, status, created_at) "
+                        f"VALUES (?, ?, ?, ?, ?, ?, ?, ?) RETURNING {_COLUMNS}",
+                        (str(uuid.uuid4()), agent, ticket.id, ticket.model_dump_json(), ticket_hash, timeout, QUEUED, now),
+                    ).fetchone()
+                    created = True
+                else:
+                    created = False
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        if not created:
+            metrics.increment("jobs_deduplicated", agent=agent)
+            return Job.from_row(row)
+        metrics.increment("jobs_submitted", agent=agent)
+        return Job.from_row(row)
+
+    def claim(self) -> Optional[Job]:
+        """Take the oldest queued job, or a running one whose lease expired, ``None`` when there is none.
+
+        The job is marked running with a fresh lease, ``attempts`` counts
+        the claims including the reclaimed ones.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                f"UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, lease_expires = ? "
+                f"WHERE id = (SELECT id FROM jobs WHERE status = ? OR (status = ? AND (lease_expires IS NULL OR lease_expires < ?)) "
+                f"ORDER BY created_at LIMIT 1) "
+                f"RETURNING {_COLUMNS}",
+                (RUNNING, now, now + self.lease_seconds, QUEUED, RUNNING, now),
+            ).fetchone()
+        return Job.from_row(row) if row is not None else None
+
+    def renew(self, job: Job) -> bool:
+        """Extend the lease of a running job, ``False`` when the job was claimed by another worker."""
+        with self._lock:
+            return self._db.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND status = ? AND attempts = ?",
+                (time.time() + self.lease_seconds, job.id, RUNNING, job.attempts),
+            ).rowcount == 1
+
+    def complete(self, job: Job, result: Dict[str, Any]) -> bool:
+        """Store the result, ``False`` when the lease was lost and the result is dropped."""
+        with self._lock:
+            return self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, finished_at = ?, lease_expires = NULL "
+                "WHERE id = ? AND status = ? AND attempts = ?",
+                (SUCCEEDED, json.dumps(result, ensure_ascii=False), time.time(), job.id, RUNNING, job.attempts),
+            ).rowcount == 1
+
+    def fail(self, job: Job, error: str, retry: bool) -> bool:
+        """Queue the job again or mark it failed, ``False`` when the lease was lost."""
+        with self._lock:
+            return self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_expires = NULL "
+                "WHERE id = ? AND status = ? AND attempts = ?",
+                ((QUEUED, error, None) if retry else (FAILED, error, time.time())) + (job.id, RUNNING, job.attempts),
+            ).rowcount == 1
+
+    def release(self, job: Job) -> bool:
+        """Queue a job interrupted by shutdown again without counting the attempt."""
+        with self._lock:
+            return self._db.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts - 1, lease_expires = NULL "
+                "WHERE id = ? AND status = ? AND attempts = ?",
+                (QUEUED, job.id, RUNNING, job.attempts),
+            ).rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._db.execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row is not None else None
+
+    def latest_draft(self, ticket_id: str, agent: Optional[str] = None) -> Optional[Job]:
+        """The most recently finished successful job of the ticket."""
+        query = f"SELECT {_COLUMNS} FROM jobs WHERE ticket_id = ? AND status = ?"
+        params: List[Any] = [ticket_id, SUCCEEDED]
+        if agent is not None:
+            query += " AND agent = ?"
+            params.append(agent)
+        with self._lock:
+            row = self._db.execute(query + " ORDER BY finished_at DESC LIMIT 1", params).fetchone()
+        return Job.from_row(row) if row is not None else None
+
+    def queue_length(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+
+    def purge(self, retention_seconds: float, max_finished: Optional[int] = None) -> int:
+        """Delete finished jobs older than the retention, keep at most ``max_finished`` of them."""
+        with self._lock:
+            deleted = self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (SUCCEEDED, FAILED, time.time() - retention_seconds),
+            ).rowcount
+            if max_finished is not None:
+                deleted += self._db.execute(
+                    "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE status IN (?, ?) "
+                    "ORDER BY finished_at DESC LIMIT -1 OFFSET ?)",
+                    (SUCCEEDED, FAILED, max_finished),
+                ).rowcount
+        return deleted
+
+
+class JobWorkerPool:
+    """Fixed number of asyncio workers running the queued jobs.
+
+    The number of workers bounds the graphs running at a time independently
+    of the HTTP concurrency. Workers are woken up by ``notify`` after a
+    submission and also poll the store, so jobs queued by another process
+    sharing the database, or left running by a stopped one, are picked up
+    as well. The lease of a running job is renewed every third of
+    ``JobStore.lease_seconds``. A job claimed more than ``max_attempts``
+    times, e.g. because it keeps crashing its process, is failed.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        run: Callable[[Job], Awaitable[Dict[str, Any]]],
+        *,
+        workers: int = 4,
+        max_attempts: int = 2,
+        poll_interval: float = 1.0,
+        retention_seconds: float = 7 * 24 * 3600,
+        max_finished: Optional[int] = None,
+        purge_interval: float = 3600.0,
+    ) -> None:
+        self._store = store
+        self._run = run
+        self._workers = workers
+        self._max_attempts = max_attempts
+        self._poll_interval = poll_interval
+        self._retention_seconds = retention_seconds
+        self._max_finished = max_finished
+        self._purge_interval = purge_interval
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self._workers)]
+        self._tasks.append(asyncio.create_task(self._purge()))
+
+    async def aclose(self) -> None:
+        """Stop the workers, interrupted jobs are queued again for the other workers or the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    async def _next_job(self) -> Job:
+        while True:
+            claim = asyncio.ensure_future(asyncio.to_thread(self._store.claim))
+            try:
+                job = await asyncio.shield(claim)
+            except asyncio.CancelledError:
+                # Shutting down while the claim runs in its thread, the claimed job must not keep its lease.
+                job = await claim
+                if job is not None:
+                    self._store.release(job)
+                raise
+            except Exception as e:
+                # E.g. "database is locked" with several processes, the worker must keep running.
+                logger.warning("Claiming a job failed: %r", e)
+                metrics.increment("job_store_errors", operation="claim")
+                await asyncio.sleep(self._poll_interval)
+                continue
+            if job is not None:
+                return job
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._next_job()
+            try:
+                await self._process(job)
+            except Exception as e:
+                # Completing or failing the job in the store failed, it keeps its lease until that
+                # expires and is then claimed again.
+                logger.warning("Updating job %s in the store failed: %r", job.id, e)
+                metrics.increment("job_store_errors", operation="update")
+                await asyncio.sleep(self._poll_interval)
+
+    async def _process(self, job: Job) -> None:
+        """Run a claimed job and record its outcome in the store."""
+        metrics.observe("job_queue_seconds", job.started_at - job.created_at, agent=job.agent)
+        if job.attempts > self._max_attempts:
+            # Only a job whose lease expired gets here, its worker stopped or hung on every attempt.
+            logger.warning("Job %s lease expired on its last attempt", job.id)
+            await asyncio.to_thread(self._store.fail, job, 'Lease expired', False)
+            metrics.increment("jobs_failed", agent=job.agent, retried=False)
+            return
+        if job.attempts > 1:
+            metrics.increment("jobs_attempted_again", agent=job.agent)
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            result = await self._run(job)
+        except asyncio.CancelledError:
+            # Shutting down, the blocking call is short and the job must not wait for its lease to expire.
+            self._store.release(job)
+            raise
+        except Exception as e:
+            retry = job.attempts < self._max_attempts
+            logger.warning("Job %s (attempt %d) failed: %r", job.id, job.attempts, e)
+            await asyncio.to_thread(self._store.fail, job, repr(e), retry)
+            metrics.increment("jobs_failed", agent=job.agent, retried=retry)
+            return
+        finally:
+            heartbeat.cancel()
+        if not await asyncio.to_thread(self._store.complete, job, result):
+            logger.warning("Job %s lease was lost, its result is dropped", job.id)
+            metrics.increment("jobs_lease_lost", agent=job.agent)
+            return
+        metrics.increment("jobs_succeeded", agent=job.agent)
+        metrics.observe("job_run_seconds", time.time() - job.started_at, agent=job.agent)
+
+    async def _heartbeat(self, job: Job) -> None:
+        while True:
+            await asyncio.sleep(self._store.lease_seconds / 3)
+            try:
+                if not await asyncio.to_thread(self._store.renew, job):
+                    logger.warning("Job %s lease was lost to another worker", job.id)
+                    return
+            except Exception as e:
+                logger.warning("Renewing the lease of job %s failed: %r", job.id, e)
+
+    async def _purge(self) -> None:
+        while True:
+            try:
+                deleted = await asyncio.to_thread(self._store.purge, self._retention_seconds, self._max_finished)
+                if deleted:
+                    logger.info("Purged %d finished jobs", deleted)
+            except Exception as e:
+                logger.warning("Purging finished jobs failed: %r", e)
+            await asyncio.sleep(self._purge_interval)
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun
+from langchain_core.language_models.base import LanguageModelInput
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, BaseMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableConfig
+from langchain_openai import AzureChatOpenAI
+
+from cpr_langgraph_agent.deadline import get_deadline
+from cpr_langgraph_agent.guards import get_guard
+
+__all__ = ["AgentChatModel", "DRY_RUN_REPLY", "is_dry_run"]
+
+DRY_RUN_REPLY = "Dry run, the model was not called."
+
+
+def is_dry_run(config: Optional[RunnableConfig]) -> bool:
+    return bool((config or {}).get("configurable", {}).get("dry_run"))
+
+
+class AgentChatModel(AzureChatOpenAI):
+    """``AzureChatOpenAI`` adjusting every call to the request it serves.
+
+    The request timeout of each call is derived from the deadline of the
+    request, so a call never outlives the caller. Once the ``RunGuard`` of the
+    request terminated the tool loop, the model is not allowed to call tools
+    and has to answer. Runs with the ``dry_run`` configurable (the startup
+    warm-up) get ``DRY_RUN_REPLY`` without calling the API.
+    """
+
+    def _request_kwargs(self, config: Optional[RunnableConfig], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        deadline = get_deadline(config)
+        if deadline is not None and "timeout" not in kwargs:
+            cap = self.request_timeout if isinstance(self.request_timeout, (int, float)) else None
+            kwargs["timeout"] = deadline.timeout(cap)
+        guard = get_guard(config)
+        if guard is not None and guard.terminated and kwargs.get("tools"):
+            kwargs["tool_choice"] = "none"
+            kwargs.pop("parallel_tool_calls", None)
+        if is_dry_run(config):
+            kwargs["dry_run"] = True
+        return kwargs
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if kwargs.pop("dry_run", False):
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=DRY_RUN_REPLY))])
+        return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if kwargs.pop("dry_run", False):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=DRY_RUN_REPLY))
+            return
+        async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            yield chunk
+
+    async def ainvoke(
+        self,
+        input: LanguageModelInput,
+        config: Optional[RunnableConfig] = None,
+        **kwargs: Any,
+    ) -> BaseMessage:
+        return await super().ainvoke(input, config, **self._request_kwargs(config, kwargs))
+
+    async def astream(
+        self,
+        input: LanguageModelInput,
+        config: Optional[RunnableConfig] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[BaseMessageChunk]:
+        async for chunk in super().astream(input, config, **self._request_kwargs(config, kwargs)):
+            yield chunk
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+
+from cpr_langgraph_agent.memory_prompts import SUMMARY_MESSAGE, SUMMARY_PROMPT
+from cpr_langgraph_agent.metrics import metrics
+from cpr_langgraph_agent.state_models import ConversationSummary
+
+__all__ = ["ConversationMemory", "MemoryPolicy", "compact_history", "get_memory"]
+
+logger = logging.getLogger(__name__)
+
+# Tools whose result is written to the state channels shown in the CURRENT DATA, their messages only say so.
+STATE_TOOLS = frozenset({
+    'get_customer_by_email',
+    'get_customer_consumption_points',
+    'get_customer_contracts',
+    'get_contract_payments',
+    'find_relevant_claims',
+})
+# Supervisor handoffs (transfer_to_<agent>, transfer_back_to_supervisor) carry no data either.
+HANDOFF_TOOL_PREFIX = 'transfer_'
+
+
+def _redundant(tool_name: str) -> bool:
+    return tool_name in STATE_TOOLS or tool_name.startswith(HANDOFF_TOOL_PREFIX)
+
+
+@dataclass
+class MemoryPolicy:
+    max_turns: int = 3
+    drop_tool_messages: bool = True
+    summarize: bool = True
+
+    @classmethod
+    def from_env(cls) -> "MemoryPolicy":
+        return cls(
+            max_turns=int(os.getenv("MEMORY_MAX_TURNS", cls.max_turns)),
+            drop_tool_messages=os.getenv("MEMORY_DROP_TOOL_MESSAGES", "true").lower() in ("1", "true", "yes"),
+            summarize=os.getenv("MEMORY_SUMMARIZE", "true").lower() in ("1", "true", "yes"),
+        )
+
+
+def _turn_starts(messages: Sequence[BaseMessage]) -> List[int]:
+    return [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+
+
+def drop_redundant_tool_calls(messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """Remove the calls of state and handoff tools together with their results.
+
+    A tool result is only valid next to the AI message calling it, so the
+    call is removed from that message as well; an AI message left without
+    calls and text is dropped.
+    """
+    redundant = {
+        call['id']
+        for message in messages if isinstance(message, AIMessage)
+        for call in message.tool_calls if _redundant(call['name'])
+    }
+    if not redundant:
+        return list(messages)
+    result: List[BaseMessage] = []
+    for message in messages:
+        if isinstance(message, ToolMessage) and message.tool_call_id in redundant:
+            continue
+        if isinstance(message, AIMessage) and message.tool_calls:
+            kept = [call for call in message.tool_calls if call['id'] not in redundant]
+            if len(kept) < len(message.tool_calls):
+                if not kept and not message.content:
+                    continue
+                message = message.model_copy(update={
+                    'tool_calls': kept,
+                    'additional_kwargs': {k: v for k, v in message.additional_kwargs.items() if k != 'tool_calls'},
+                })
+        result.append(message)
+    return result
+
+
+def _transcript(messages: Sequence[BaseMessage]) -> str:
+    lines = []
+    for message in drop_redundant_tool_calls(messages):
+        if isinstance(message, (HumanMessage, AIMessage)) and isinstance(message.content, str) and message.content:
+            lines.append(f"{'User' if isinstance(message, HumanMessage) else 'Agent'}: {message.content}")
+    return '\n\n'.join(lines)
+
+
+class ConversationMemory:
+    """Keeps the history sent to the model about the same size however long the thread is.
+
+    Threads are keyed by the ticket, every run on a ticket appends a turn
+    (its human message and everything after it). Only the last
+    ``max_turns`` turns are sent verbatim, the earlier ones are folded into
+    a rolling summary. Tool calls of state and handoff tools are dropped
+    from the completed turns, their data are in the CURRENT DATA. The
+    summary is stored in the ``conversation_summary`` state channel with the
+    id of the last message it covers, so it is computed once per new turn
+    and shared by every agent and worker reading the thread. The thread
+    itself is never modified.
+    """
+
+    def __init__(self, llm: BaseChatModel, policy: Optional[MemoryPolicy] = None) -> None:
+        self.llm = llm
+        self.policy = policy or MemoryPolicy()
+
+    async def acompact(self, agent: str, state: Any, config: RunnableConfig) -> Tuple[List[BaseMessage], Dict[str, Any]]:
+        """The history to send to the model and the state update caching the summary."""
+        messages = state.messages
+        starts = _turn_starts(messages)
+        if len(starts) <= 1 or self.policy.max_turns <= 0:
+            return list(messages), {}
+        keep_from = starts[max(len(starts) - self.policy.max_turns, 0)]
+        current_from = starts[-1]
+        previous = messages[keep_from:current_from]
+        if self.policy.drop_tool_messages:
+            previous = drop_redundant_tool_calls(previous)
+        history = [*previous, *messages[current_from:]]
+        if keep_from == 0:
+            return history, {}
+        metrics.observe("memory_folded_messages", keep_from, agent=agent)
+        if not self.policy.summarize:
+            return history, {}
+        summary = await self._summary(agent, state.conversation_summary, messages[:keep_from], config)
+        if summary is None:
+            return history, {}
+        prefix = [SystemMessage(content=SUMMARY_MESSAGE.format(summary=summary.content)), *history]
+        update = {'conversation_summary': summary} if summary is not state.conversation_summary else {}
+        return prefix, update
+
+    async def _summary(
+        self,
+        agent: str,
+        cached: Optional[ConversationSummary],
+        older: Sequence[BaseMessage],
+        config: RunnableConfig,
+    ) -> Optional[ConversationSummary]:
+        last_id = older[-1].id
+        if cached is not None and cached.last_message_id == last_id:
+            return cached
+        ids = [message.id for message in older]
+        new = older
+        previous = ''
+        if cached is not None and cached.last_message_id in ids:
+            new = older[ids.index(cached.last_message_id) + 1:]
+            previous = cached.content
+        try:
+            reply = await self.llm.ainvoke(
+                [
+                    SystemMessage(content=SUMMARY_PROMPT),
+                    HumanMessage(content=f'PREVIOUS SUMMARY:\n{previous}\n\nEARLIER TURNS:\n{_transcript(new)}'),
+                ],
+                config=config,
+            )
+        except Exception as e:
+            # The recent turns and the CURRENT DATA are enough to go on, the older turns are just left out.
+            logger.warning("Summarizing the conversation failed, earlier turns are left out: %r", e)
+            metrics.increment("memory_summaries_failed", agent=agent)
+            return cached
+        metrics.increment("memory_summaries", agent=agent)
+        return ConversationSummary(content=reply.content, last_message_id=last_id)
+
+
+def get_memory(config: Optional[RunnableConfig]) -> Optional[ConversationMemory]:
+    return (config or {}).get("configurable", {}).get("memory")
+
+
+async def compact_history(config: Optional[RunnableConfig], agent: str, state: Any) -> Tuple[List[BaseMessage], Dict[str, Any]]:
+    """History of ``state`` bounded by the memory of the current request, unchanged without one."""
+    memory = get_memory(config)
+    if memory is None:
+        return list(state.messages), {}
+    return await memory.acompact(agent, state, config)
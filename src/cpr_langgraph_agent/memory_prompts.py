@@ -0,0 +1,19 @@
+SUMMARY_PROMPT = '''
+# SYSTEM PROMPT — "Claims-Responder" Conversation Summary
+
+## Input
+The PREVIOUS SUMMARY (possibly empty) and the EARLIER TURNS of the conversation about one customer claim ticket.
+Customer, contract, payment and similar ticket data are kept separately and are not part of the turns.
+
+## Mission
+Write an updated summary of the conversation for the agent that continues working on the ticket:
+1. Keep the requests made, the decisions taken and the drafted replies with their key facts (amounts, dates, identifiers).
+2. Keep what was found missing or failed, so it is not repeated.
+3. Leave out greetings, tool bookkeeping and anything the later turns made obsolete.
+4. Write in English, at most 200 words.
+
+## Output
+Return only the summary text.
+'''
+
+SUMMARY_MESSAGE = 'Following is the SUMMARY of the earlier conversation on this ticket: \n {summary}'
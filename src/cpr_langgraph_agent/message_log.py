@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, IO, List, Optional, Sequence
+
+import orjson
+from langchain_core.messages import BaseMessage
+
+from cpr_langgraph_agent.metrics import metrics
+
+__all__ = ["MessageLog", "MessageLogSettings"]
+
+logger = logging.getLogger(__name__)
+
+TRUNCATED = '…[truncated]'
+
+
+@dataclass
+class MessageLogSettings:
+    sample_rate: float = 1.0
+    max_message_chars: int = 2000
+    max_record_bytes: int = 65536
+    queue_size: int = 1000
+    batch_size: int = 100
+
+    @classmethod
+    def from_env(cls) -> "MessageLogSettings":
+        return cls(
+            sample_rate=float(os.getenv("MESSAGE_LOG_SAMPLE_RATE", cls.sample_rate)),
+            max_message_chars=int(os.getenv("MESSAGE_LOG_MAX_MESSAGE_CHARS", cls.max_message_chars)),
+            max_record_bytes=int(os.getenv("MESSAGE_LOG_MAX_RECORD_BYTES", cls.max_record_bytes)),
+            queue_size=int(os.getenv("MESSAGE_LOG_QUEUE_SIZE", cls.queue_size)),
+        )
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit] + TRUNCATED
+
+
+class MessageLog:
+    """Structured log of the agent runs, written off the request path.
+
+    ``log_run`` only builds a compact record and puts it into a bounded
+    queue; a background task writes the queued records as JSON lines to
+    ``stream`` from a worker thread. Every run gets a summary record, the
+    messages are attached for a ``sample_rate`` fraction of the runs only,
+    each message content is cut to ``max_message_chars`` and messages are
+    dropped from the start until the record fits ``max_record_bytes``.
+    When the writer falls behind, records are dropped and counted rather
+    than slowing down the requests.
+    """
+
+    def __init__(self, settings: Optional[MessageLogSettings] = None, stream: Optional[IO[bytes]] = None) -> None:
+        self.settings = settings or MessageLogSettings()
+        self._stream = stream if stream is not None else sys.stdout.buffer
+        self._queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=self.settings.queue_size)
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the writer task, must be called from a running event loop."""
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+
+    async def aclose(self) -> None:
+        """Write the queued records and stop the writer."""
+        if self._writer is None:
+            return
+        await self._queue.join()
+        self._writer.cancel()
+        await asyncio.gather(self._writer, return_exceptions=True)
+        self._writer = None
+
+    # ---------------------------------------------------------------------
+    # Records
+    # ---------------------------------------------------------------------
+    def log_run(self, agent: str, ticket_id: str, messages: Sequence[Any], **fields: Any) -> None:
+        record: Dict[str, Any] = {'event': 'agent_run', 'agent': agent, 'ticket_id': ticket_id, **fields}
+        if random.random() < self.settings.sample_rate:
+            record['messages'] = [
+                self._message(m) for m in messages if isinstance(m, BaseMessage)
+            ]
+        self._put(self._encode(record))
+
+    def _message(self, message: BaseMessage) -> Dict[str, Any]:
+        limit = self.settings.max_message_chars
+        content = message.content if isinstance(message.content, str) else orjson.dumps(message.content).decode()
+        item: Dict[str, Any] = {'type': message.type, 'content': _truncate(content, limit)}
+        if message.name:
+            item['name'] = message.name
+        tool_calls = getattr(message, 'tool_calls', None)
+        if tool_calls:
+            item['tool_calls'] = [
+                {'name': c['name'], 'args': _truncate(orjson.dumps(c['args']).decode(), limit)} for c in tool_calls
+            ]
+        tool_call_id = getattr(message, 'tool_call_id', None)
+        if tool_call_id:
+            item['tool_call_id'] = tool_call_id
+        return item
+
+    def _encode(self, record: Dict[str, Any]) -> bytes:
+        data = orjson.dumps(record, default=str)
+        messages: List[Dict[str, Any]] = record.get('messages') or []
+        dropped = 0
+        while len(data) > self.settings.max_record_bytes and messages:
+            messages.pop(0)
+            dropped += 1
+            record['messages_dropped'] = dropped
+            data = orjson.dumps(record, default=str)
+        return data + b'\n'
+
+    def _put(self, data: bytes) -> None:
+        try:
+            self._queue.put_nowait(data)
+        except asyncio.QueueFull:
+            metrics.increment("message_log_dropped")
+
+    # ---------------------------------------------------------------------
+    # Writer
+    # ---------------------------------------------------------------------
+    async def _write_loop(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.settings.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                logger.warning("Writing %d message log records failed: %r", len(batch), e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch: List[bytes]) -> None:
+        self._stream.write(b''.join(batch))
+        self._stream.flush()
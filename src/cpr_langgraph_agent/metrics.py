@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+__all__ = ["Metrics", "metrics"]
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    """Minimal in-process metrics registry.
+
+    Counters are monotonic sums, summaries keep count, sum and max of the
+    observed values. Both are keyed by name and a set of string labels.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = defaultdict(lambda: defaultdict(float))
+        self._summaries: Dict[str, Dict[LabelKey, List[float]]] = defaultdict(dict)
+
+    @staticmethod
+    def _key(labels: Dict[str, Any]) -> LabelKey:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def increment(self, name: str, value: float = 1, **labels: Any) -> None:
+        with self._lock:
+            self._counters[name][self._key(labels)] += value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            summary = self._summaries[name].get(key)
+            if summary is None:
+                self._summaries[name][key] = [1, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                summary[2] = max(summary[2], value)
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Return all metrics as ``{name: [{**labels, value | count, sum, max}]}``."""
+        with self._lock:
+            result: Dict[str, List[Dict[str, Any]]] = {}
+            for name, series in self._counters.items():
+                result[name] = [{**dict(key), "value": value} for key, value in series.items()]
+            for name, series in self._summaries.items():
+                result[name] = [
+                    {**dict(key), "count": count, "sum": total, "max": maximum}
+                    for key, (count, total, maximum) in series.items()
+                ]
+            return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+
+metrics = Metrics()
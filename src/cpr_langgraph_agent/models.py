@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import Optional
-from datetime import date
+from typing import List, Optional
+from datetime import date, datetime
 from decimal import Decimal
 
 class Ticket(BaseModel):
@@ -63,4 +63,11 @@ class Payment(BaseModel):
     variable_symbol: str = Field(description='Payment variable symbol')
     constant_symbol: str = Field(description='Payment constant symbol')
     specific_symbol: str = Field(description='Payment specific symbol')
-    message: Optional[str] = Field(description='Message for the payee', default=None)
\ No newline at end of file
+    message: Optional[str] = Field(description='Message for the payee', default=None)
+class ClaimRecord(Ticket):
+    filename: Optional[str] = Field(description='Name of the file the ticket was exported to', default=None)
+    source_uri: Optional[str] = Field(description='URI of the ticket in the source system', default=None)
+    key_phrases: List[str] = Field(description='Key phrases extracted from the customer claim', default_factory=list)
+    entities: List[str] = Field(description='Entities recognized in the customer claim', default_factory=list)
+    index_datetime: Optional[datetime] = Field(description='Last modification of the ticket in the source system', default=None)
+    deleted: bool = Field(description='Ticket was deleted in the source system', default=False)
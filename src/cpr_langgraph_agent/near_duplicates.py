@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import logging
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from cpr_langgraph_agent.metrics import metrics
+from cpr_langgraph_agent.models import Ticket
+
+__all__ = ["NearDuplicate", "NearDuplicateIndex", "minhash_signature"]
+
+logger = logging.getLogger(__name__)
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS = NUM_PERMUTATIONS // BANDS
+SHINGLE_SIZE = 5
+EXPIRY_INTERVAL_SECONDS = 60.0
+SYNC_INTERVAL_SECONDS = 1.0
+
+_PRIME = np.uint64((1 << 61) - 1)
+# Fixed seed, signatures are persisted and have to be comparable across processes.
+# a * crc32 + b wraps around 2**64 on purpose, as in the usual numpy MinHash implementations;
+# without the wrap-around the permutation is monotonic and every band picks the same shingle.
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, _PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+# AUTOINCREMENT never hands out a sequence number again, not even the one of a deleted last row;
+# the sync position of the other processes relies on that.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS near_duplicates (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticket_id TEXT NOT NULL UNIQUE,
+    partition TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    draft TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+_COLUMNS = "ticket_id, partition, signature, draft, created_at"
+
+Partition = Tuple[str, str, str]
+
+
+def _shingles(text: str) -> np.ndarray:
+    """CRC32 hashes of the character shingles of the normalized text."""
+    normalized = " ".join(_NON_WORD.sub(" ", text.casefold()).split())
+    if len(normalized) <= SHINGLE_SIZE:
+        return np.array([zlib.crc32(normalized.encode())], dtype=np.uint64)
+    return np.fromiter(
+        {zlib.crc32(normalized[i:i + SHINGLE_SIZE].encode()) for i in range(len(normalized) - SHINGLE_SIZE + 1)},
+        dtype=np.uint64,
+    )
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash signature of ``text``, the share of equal values estimates the Jaccard similarity."""
+    hashes = (np.outer(_A, _shingles(text)) + _B[:, None]) % _PRIME
+    return hashes.min(axis=1).astype(np.uint32)
+
+
+def _bands(signature: np.ndarray) -> List[Tuple[int, bytes]]:
+    return [(band, signature[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+
+def _partition(ticket: Ticket) -> Partition:
+    return ticket.category_1, ticket.category_2, ticket.category_3
+
+
+@dataclass
+class NearDuplicate:
+    ticket_id: str
+    draft: str
+    similarity: float
+
+
+@dataclass
+class _Entry:
+    ticket_id: str
+    partition: Partition
+    signature: np.ndarray
+    draft: str
+    created_at: float
+
+
+class NearDuplicateIndex:
+    """Index of the drafts of processed tickets by MinHash signature of the claim.
+
+    Signatures are split into ``BANDS`` bands hashed into LSH buckets, kept
+    separately for every ``category_1..3`` combination; only tickets sharing
+    a bucket and the categories are compared. A candidate is a near-duplicate
+    when the estimated Jaccard similarity of the character shingles reaches
+    ``threshold``. The index lives in memory, is mirrored to SQLite when a
+    ``path`` is given and keeps at most ``max_entries`` tickets younger than
+    ``max_age_seconds``, the least recently matched are evicted first.
+
+    Worker processes sharing the database see each other's drafts: a lookup
+    first loads the rows added since the last one, at most once per
+    ``SYNC_INTERVAL_SECONDS``. ``lookup`` and ``add`` block on SQLite and
+    on the index lock, call them from a worker thread.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        *,
+        threshold: float = 0.85,
+        max_entries: int = 50_000,
+        max_age_seconds: float = 30 * 24 * 3600,
+    ) -> None:
+        self.threshold = threshold
+        self._max_entries = max_entries
+        self._max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._buckets: Dict[Partition, Dict[Tuple[int, bytes], Set[str]]] = defaultdict(lambda: defaultdict(set))
+        self._expired_at = 0.0
+        self._synced_at = 0.0
+        self._last_seq = 0
+        self.lookups = 0
+        self.hits = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._migrate()
+            self._load()
+
+    def _migrate(self) -> None:
+        # Tables created before the seq column are keyed by ticket_id and reuse rowids, copy them over.
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(near_duplicates)")}
+            if columns and 'seq' not in columns:
+                self._db.execute("ALTER TABLE near_duplicates RENAME TO near_duplicates_old")
+                self._db.execute(_SCHEMA)
+                self._db.execute(
+                    f"INSERT INTO near_duplicates ({_COLUMNS}) "
+                    f"SELECT {_COLUMNS} FROM near_duplicates_old ORDER BY rowid"
+                )
+                self._db.execute("DROP TABLE near_duplicates_old")
+            else:
+                self._db.execute(_SCHEMA)
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def _load(self) -> None:
+        self._sync()
+        logger.info("Loaded %d near-duplicate entries", len(self._entries))
+
+    def _sync(self) -> None:
+        # INSERT OR REPLACE gives a replaced row a new seq, so rows after the last seen one are all new.
+        rows = self._db.execute(
+            f"SELECT seq, {_COLUMNS} FROM near_duplicates WHERE seq > ? ORDER BY seq",
+            (self._last_seq,),
+        ).fetchall()
+        for seq, ticket_id, partition, signature, draft, created_at in rows:
+            self._remove(ticket_id)
+            self._insert(_Entry(
+                ticket_id, tuple(partition.split("\x1f")), np.frombuffer(signature, dtype=np.uint32), draft, created_at,
+            ))
+            self._last_seq = seq
+        self._synced_at = time.monotonic()
+        if rows:
+            self._evict()
+
+    def close(self) -> None:
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
+
+    # ---------------------------------------------------------------------
+    # Lookup and update
+    # ---------------------------------------------------------------------
+    def lookup(self, ticket: Ticket) -> Optional[NearDuplicate]:
+        """The most similar processed ticket of the same categories above the threshold."""
+        signature = minhash_signature(ticket.request_content)
+        partition = _partition(ticket)
+        with self._lock:
+            if self._db is not None and time.monotonic() - self._synced_at >= SYNC_INTERVAL_SECONDS:
+                self._sync()
+            buckets = self._buckets.get(partition)
+            candidates: Set[str] = set()
+            if buckets is not None:
+                for key in _bands(signature):
+                    candidates.update(buckets.get(key, ()))
+            candidates.discard(ticket.id)
+            best: Optional[_Entry] = None
+            best_similarity = 0.0
+            expired_before = time.time() - self._max_age_seconds
+            for ticket_id in candidates:
+                entry = self._entries[ticket_id]
+                if entry.created_at < expired_before:
+                    continue
+                similarity = float(np.count_nonzero(entry.signature == signature)) / NUM_PERMUTATIONS
+                if similarity > best_similarity:
+                    best, best_similarity = entry, similarity
+            self.lookups += 1
+            if best is None or best_similarity < self.threshold:
+                metrics.increment("near_duplicate_lookups", hit=False)
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best.ticket_id)
+        metrics.increment("near_duplicate_lookups", hit=True)
+        return NearDuplicate(best.ticket_id, best.draft, best_similarity)
+
+    def add(self, ticket: Ticket, draft: str) -> None:
+        entry = _Entry(ticket.id, _partition(ticket), minhash_signature(ticket.request_content), draft, time.time())
+        with self._lock:
+            self._remove(ticket.id)
+            self._insert(entry)
+            if self._db is not None:
+                seq = self._db.execute(
+                    f"INSERT OR REPLACE INTO near_duplicates ({_COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                    (entry.ticket_id, "\x1f".join(entry.partition), entry.signature.tobytes(), draft, entry.created_at),
+                ).lastrowid
+                # The own row must not be read back by the next sync. With a gap another process wrote
+                # rows in between, load them now, before the position moves past them.
+                if seq != self._last_seq + 1:
+                    self._sync()
+                self._last_seq = max(self._last_seq, seq)
+            self._evict()
+
+    def _insert(self, entry: _Entry) -> None:
+        self._entries[entry.ticket_id] = entry
+        buckets = self._buckets[entry.partition]
+        for key in _bands(entry.signature):
+            buckets[key].add(entry.ticket_id)
+
+    def _remove(self, ticket_id: str) -> None:
+        entry = self._entries.pop(ticket_id, None)
+        if entry is None:
+            return
+        buckets = self._buckets[entry.partition]
+        for key in _bands(entry.signature):
+            bucket = buckets.get(key)
+            if bucket is not None:
+                bucket.discard(ticket_id)
+                if not bucket:
+                    del buckets[key]
+        if not buckets:
+            del self._buckets[entry.partition]
+
+    def _evict(self) -> None:
+        # Least recently matched first, the full scan for expired entries runs once per interval.
+        evicted: List[str] = []
+        while len(self._entries) > self._max_entries:
+            evicted.append(next(iter(self._entries)))
+            self._remove(evicted[-1])
+        now = time.time()
+        if now - self._expired_at >= EXPIRY_INTERVAL_SECONDS:
+            self._expired_at = now
+            expired_before = now - self._max_age_seconds
+            for ticket_id in [t for t, entry in self._entries.items() if entry.created_at < expired_before]:
+                evicted.append(ticket_id)
+                self._remove(ticket_id)
+        if evicted and self._db is not None:
+            self._db.executemany("DELETE FROM near_duplicates WHERE ticket_id = ?", [(t,) for t in evicted])
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'partitions': len(self._buckets),
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+            }
@@ -0,0 +1,43 @@
+import logging
+from typing import List
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_openai import AzureChatOpenAI
+
+from cpr_langgraph_agent.crm_client import AsyncCrmClient
+from cpr_langgraph_agent.deadline import remaining_timeout
+from cpr_langgraph_agent.models import Ticket
+from cpr_langgraph_agent.near_duplicates import NearDuplicate
+from cpr_langgraph_agent.usage import record_prompt_breakdown
+from cpr_langgraph_agent.prompt_layout import render_json
+from cpr_langgraph_agent.personalization_agent_prompts import AGENT_PROMPT
+
+logger = logging.getLogger(__name__)
+
+class PersonalizationAgent:
+    """Single LLM call adapting the draft of a near-duplicate ticket to the incoming one."""
+
+    def __init__(self, llm: AzureChatOpenAI, crm_client: AsyncCrmClient):
+        self.llm = llm
+        self.crm_client = crm_client
+
+    async def apersonalize(self, ticket: Ticket, match: NearDuplicate, config: RunnableConfig) -> List[BaseMessage]:
+        """Return the messages of the step, the last one is the personalized draft."""
+        content = {'incoming_ticket': ticket.model_dump(mode='json')}
+        try:
+            customer = await self.crm_client.get_customer_by_email(ticket.email, timeout=remaining_timeout(config))
+            content['customer'] = customer.model_dump(mode='json')
+        except Exception as e:
+            # The template is still useful without the customer record, the reply is just less personal.
+            logger.warning("Customer of ticket %s not loaded for personalization: %r", ticket.id, e)
+        await record_prompt_breakdown(config, 'personalization_agent', AGENT_PROMPT, [], {**content, 'template_reply': match.draft})
+        messages: List[BaseMessage] = [
+            SystemMessage(content=AGENT_PROMPT),
+            HumanMessage(content=(
+                f'Following are the CURRENT DATA: \n {render_json(content)}'
+                f'\n\nTEMPLATE REPLY (ticket {match.ticket_id}):\n{match.draft}'
+            )),
+        ]
+        reply = await self.llm.ainvoke(messages, config=config)
+        return [*messages, reply]
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableConfig
+from langchain_community.vectorstores.azuresearch import AzureSearch
+
+from cpr_langgraph_agent.crm_client import AsyncCrmClient
+from cpr_langgraph_agent.deadline import DEFAULT_SEARCH_TIMEOUT, Deadline
+from cpr_langgraph_agent.index_schema import ACTIVE_DOCUMENTS_FILTER
+from cpr_langgraph_agent.models import Ticket, Customer, ConsumptionPoint, Contract
+
+__all__ = ["TicketPrefetch", "get_prefetch"]
+
+logger = logging.getLogger(__name__)
+
+SIMILAR_CLAIMS_COUNT = 5
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+class TicketPrefetch:
+    """Speculative loading of the data the agents ask for on almost every ticket.
+
+    The first LLM turn nearly always looks up the customer by e-mail and
+    searches for similar claims. The prefetch starts those calls as soon as
+    the ticket arrives, so the I/O overlaps with the model latency. It mirrors
+    the ``AsyncCrmClient`` and ``AzureSearch`` methods used by the tools and
+    falls back to the real clients when the arguments differ from the
+    speculated ones.
+    """
+
+    def __init__(
+        self,
+        ticket: Ticket,
+        crm_client: AsyncCrmClient,
+        search: Optional[AzureSearch] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> None:
+        self._ticket = ticket
+        self._deadline = deadline
+        self._crm_client = crm_client
+        self._search = search
+        self._customer: Optional[asyncio.Task] = None
+        self._consumption_points: Optional[asyncio.Task] = None
+        self._contracts: Optional[asyncio.Task] = None
+        self._similar_claims: Optional[asyncio.Task] = None
+        self.used: set[str] = set()
+
+    def start(self) -> "TicketPrefetch":
+        """Start the background tasks, must be called from a running event loop."""
+        self._customer = asyncio.create_task(
+            self._crm_client.get_customer_by_email(self._ticket.email, timeout=self._timeout())
+        )
+        self._consumption_points = asyncio.create_task(
+            self._after_customer(self._crm_client.get_customer_consumption_points)
+        )
+        self._contracts = asyncio.create_task(self._after_customer(self._crm_client.get_customer_contracts))
+        if self._search is not None:
+            self._similar_claims = asyncio.create_task(asyncio.wait_for(
+                self._search.asemantic_hybrid_search(
+                    query=self._ticket.request_content,
+                    k=SIMILAR_CLAIMS_COUNT,
+                    filters=ACTIVE_DOCUMENTS_FILTER,
+                ),
+                timeout=self._timeout(DEFAULT_SEARCH_TIMEOUT),
+            ))
+        return self
+
+    def _timeout(self, cap: Optional[float] = None) -> Optional[float]:
+        return self._deadline.timeout(cap) if self._deadline is not None else cap
+
+    async def _after_customer(self, load: Callable[..., Awaitable[Any]]) -> Any:
+        customer: Customer = await asyncio.shield(self._customer)
+        return await load(customer.customer_id, timeout=self._timeout())
+
+    async def _take(self, name: str, task: asyncio.Task) -> Any:
+        self.used.add(name)
+        return await asyncio.shield(task)
+
+    async def _prefetched_customer_id(self) -> Optional[str]:
+        try:
+            customer: Customer = await asyncio.shield(self._customer)
+        except Exception:
+            return None
+        return customer.customer_id
+
+    # ---------------------------------------------------------------------
+    # Mirrors of the client methods
+    # ---------------------------------------------------------------------
+    async def get_customer_by_email(self, email: str, *, timeout: Optional[float] = None) -> Customer:
+        if self._customer is not None and email == self._ticket.email:
+            return await self._take("customer", self._customer)
+        return await self._crm_client.get_customer_by_email(email, timeout=timeout)
+
+    async def get_customer_consumption_points(
+        self,
+        customer_id: str,
+        *,
+        product_family: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> List[ConsumptionPoint]:
+        # The prefetch loads all product families, the filter is applied locally the same way the CRM does.
+        if self._consumption_points is not None and customer_id == await self._prefetched_customer_id():
+            consumption_points = await self._take("consumption_points", self._consumption_points)
+            if product_family is None:
+                return consumption_points
+            return [cp for cp in consumption_points if cp.product_family == product_family]
+        return await self._crm_client.get_customer_consumption_points(
+            customer_id, product_family=product_family, timeout=timeout
+        )
+
+    async def get_customer_contracts(self, customer_id: str, *, timeout: Optional[float] = None) -> List[Contract]:
+        if self._contracts is not None and customer_id == await self._prefetched_customer_id():
+            return await self._take("contracts", self._contracts)
+        return await self._crm_client.get_customer_contracts(customer_id, timeout=timeout)
+
+    async def asemantic_hybrid_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        if (
+            self._similar_claims is not None
+            and k == SIMILAR_CLAIMS_COUNT
+            and kwargs.get("filters") == ACTIVE_DOCUMENTS_FILTER
+            and _normalize(query) == _normalize(self._ticket.request_content)
+        ):
+            return await self._take("similar_claims", self._similar_claims)
+        return await self._search.asemantic_hybrid_search(query=query, k=k, **kwargs)
+
+    # ---------------------------------------------------------------------
+    # Cleanup
+    # ---------------------------------------------------------------------
+    def cancel(self) -> None:
+        """Cancel the prefetches the agent did not use."""
+        tasks = {
+            "customer": self._customer,
+            "consumption_points": self._consumption_points,
+            "contracts": self._contracts,
+            "similar_claims": self._similar_claims,
+        }
+        for name, task in tasks.items():
+            if task is None:
+                continue
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled() and task.exception() is not None and name not in self.used:
+                logger.debug("Unused prefetch %s failed: %r", name, task.exception())
+        logger.debug("Ticket %s used prefetches: %s", self._ticket.id, sorted(self.used))
+
+
+def get_prefetch(config: RunnableConfig) -> Optional[TicketPrefetch]:
+    """Return the prefetch of the current request, if the endpoint started one."""
+    return config.get("configurable", {}).get("prefetch")
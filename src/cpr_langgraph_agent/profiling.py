@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from cpr_langgraph_agent.metrics import metrics
+from cpr_langgraph_agent.usage import graph_name
+
+__all__ = ["ProfileSession", "Profiler", "ProfilingSettings"]
+
+logger = logging.getLogger(__name__)
+
+_UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+# Session of the run in the current context, inherited by the tasks it creates.
+_current_session: contextvars.ContextVar[Optional["ProfileSession"]] = contextvars.ContextVar('profile_session', default=None)
+
+
+@dataclass
+class ProfilingSettings:
+    sample_rate: float = 0.0
+    directory: str = 'profiles'
+    interval: float = 0.005
+    lag_interval: float = 0.05
+    token: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "ProfilingSettings":
+        return cls(
+            sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", cls.sample_rate)),
+            directory=os.getenv("PROFILE_DIR", cls.directory),
+            interval=float(os.getenv("PROFILE_INTERVAL_SECONDS", cls.interval)),
+            lag_interval=float(os.getenv("PROFILE_LAG_INTERVAL_SECONDS", cls.lag_interval)),
+            token=os.getenv("PROFILE_TOKEN") or None,
+        )
+
+
+def _frame_name(code: Any) -> str:
+    module = Path(code.co_filename).stem
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({module}:{code.co_firstlineno})".replace(';', ',')
+
+
+class StackSampler(threading.Thread):
+    """Samples the Python stack of the event loop thread every ``interval`` seconds.
+
+    Runs in its own thread and only reads ``sys._current_frames()``, so the
+    profiled code is not instrumented and the overhead stays at a few
+    percent. One sampler serves all sessions of the loop: a sample is
+    counted by the session owning the task running at that moment, samples
+    of other tasks and of the loop itself only add to ``other_samples`` of
+    every session. The result are collapsed stacks (``root;...;leaf count``)
+    that flame graph tools (speedscope, flamegraph.pl) read directly.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, task_sessions: Dict[asyncio.Task, "ProfileSession"], interval: float) -> None:
+        super().__init__(name='profile-sampler', daemon=True)
+        self._loop = loop
+        self._thread_id = threading.get_ident()
+        self._task_sessions = task_sessions
+        self._interval = interval
+        self._stopped = threading.Event()
+        # Guards the sessions and their counters, they are written here and read by the loop thread.
+        self.lock = threading.Lock()
+        self.sessions: Set["ProfileSession"] = set()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            task = asyncio.current_task(self._loop)
+            owner = self._task_sessions.get(task) if task is not None else None
+            names: List[str] = []
+            while frame is not None:
+                names.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if not names:
+                continue
+            with self.lock:
+                if owner in self.sessions:
+                    owner.stacks[';'.join(reversed(names))] += 1
+                    owner.samples += 1
+                else:
+                    for session in self.sessions:
+                        session.other_samples += 1
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+
+class NodeTimer(AsyncCallbackHandler):
+    """Wall time of the graph nodes, tools and LLM calls of one request."""
+
+    def __init__(self, root_agent: str) -> None:
+        self.root_agent = root_agent
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self._started: Dict[UUID, tuple[str, float]] = {}
+
+    def _start(self, run_id: UUID, key: str) -> None:
+        self._started[run_id] = (key, time.perf_counter())
+
+    def _end(self, run_id: UUID) -> None:
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            self.timings[started[0]].append(time.perf_counter() - started[1])
+
+    async def on_chain_start(
+        self,
+        serialized: Dict[str, Any],
+        inputs: Dict[str, Any],
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        # Runnables inside a node inherit its metadata, only the node run itself carries its name.
+        if node and kwargs.get("name") == node:
+            self._start(run_id, f"node:{graph_name(metadata, self.root_agent)}/{node}")
+
+    async def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    async def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    async def on_tool_start(
+        self,
+        serialized: Dict[str, Any],
+        input_str: str,
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name", "")
+        self._start(run_id, f"tool:{graph_name(metadata, self.root_agent)}/{name}")
+
+    async def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    async def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    async def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: Any,
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start(run_id, f"llm:{graph_name(metadata, self.root_agent)}")
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            key: {'count': len(values), 'total': round(sum(values), 4), 'max': round(max(values), 4)}
+            for key, values in sorted(self.timings.items())
+        }
+
+
+class ProfileSession:
+    """Profile of one agent run: stack samples, node timings, event-loop lag and task timings.
+
+    The run owns the task that started the session and every task created
+    from it, only their stack samples and timings are recorded; the
+    event-loop lag is shared by all requests running concurrently.
+    """
+
+    def __init__(self, profiler: "Profiler", ticket_id: str, agent: str) -> None:
+        self._profiler = profiler
+        self.ticket_id = ticket_id
+        self.agent = agent
+        self.node_timer = NodeTimer(agent)
+        self.task_timings: Dict[str, List[float]] = defaultdict(list)
+        self.lags: List[float] = []
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.other_samples = 0
+        self._lag_monitor: Optional[asyncio.Task] = None
+        self._context_token: Optional[contextvars.Token] = None
+        self._started = 0.0
+        self._started_at = 0.0
+
+    def start(self) -> "ProfileSession":
+        self._started = time.perf_counter()
+        self._started_at = time.time()
+        self._context_token = _current_session.set(self)
+        self._lag_monitor = asyncio.create_task(self._monitor_lag())
+        return self
+
+    async def _monitor_lag(self) -> None:
+        interval = self._profiler.settings.lag_interval
+        while True:
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.perf_counter() - expected)
+            self.lags.append(lag)
+            metrics.observe("event_loop_lag_seconds", lag)
+
+    def record_task(self, name: str, duration: float) -> None:
+        self.task_timings[name].append(duration)
+
+    async def stop(self) -> Path:
+        """Stop sampling and write the profile files, returns the path of the summary."""
+        duration = time.perf_counter() - self._started
+        self._lag_monitor.cancel()
+        _current_session.reset(self._context_token)
+        await self._profiler._finish(self)
+        return await asyncio.to_thread(self._write, duration)
+
+    def _write(self, duration: float) -> Path:
+        directory = Path(self._profiler.settings.directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(self._started_at))
+        base = directory / _UNSAFE_FILENAME.sub('_', f"{stamp}_{self.ticket_id}_{self.agent}")
+        folded = base.with_suffix('.folded')
+        folded.write_text(''.join(f"{stack} {count}\n" for stack, count in self.stacks.items()))
+        tasks = sorted(
+            ((name, len(values), sum(values), max(values)) for name, values in self.task_timings.items()),
+            key=lambda item: item[2],
+            reverse=True,
+        )
+        summary = {
+            'ticket_id': self.ticket_id,
+            'agent': self.agent,
+            'started_at': self._started_at,
+            'duration_seconds': round(duration, 4),
+            'samples': self.samples,
+            'other_samples': self.other_samples,
+            'sample_interval_seconds': self._profiler.settings.interval,
+            'flamegraph': folded.name,
+            'timings': self.node_timer.summary(),
+            'event_loop_lag': {
+                'samples': len(self.lags),
+                'max_seconds': round(max(self.lags, default=0.0), 4),
+                'mean_seconds': round(sum(self.lags) / len(self.lags), 4) if self.lags else 0.0,
+            },
+            'tasks': [
+                {'coroutine': name, 'count': count, 'total_seconds': round(total, 4), 'max_seconds': round(maximum, 4)}
+                for name, count, total, maximum in tasks[:50]
+            ],
+        }
+        path = base.with_suffix('.json')
+        path.write_text(json.dumps(summary, indent=2, ensure_ascii=False))
+        logger.info("Profile of ticket %s written to %s", self.ticket_id, path)
+        return path
+
+
+class Profiler:
+    """Decides which runs are profiled and owns the loop-wide instrumentation.
+
+    A run is profiled when the request carries the ``X-Profile`` header
+    equal to ``token`` or with probability ``sample_rate``, which the admin
+    endpoint can change at runtime; without a token the header is ignored.
+    While any session is active a single sampler thread runs and a task
+    factory times the asyncio tasks created on the loop and assigns them
+    to the session of the context creating them.
+    """
+
+    def __init__(self, settings: Optional[ProfilingSettings] = None) -> None:
+        self.settings = settings or ProfilingSettings()
+        self._sessions: Set[ProfileSession] = set()
+        self._task_sessions: Dict[asyncio.Task, ProfileSession] = {}
+        self._sampler: Optional[StackSampler] = None
+        self._previous_factory: Any = None
+
+    def should_profile(self, header: Optional[str] = None) -> bool:
+        if header:
+            if self.settings.token is not None and header == self.settings.token:
+                return True
+            logger.warning("Ignoring X-Profile header, PROFILE_TOKEN is not set or does not match")
+        return self.settings.sample_rate > 0 and random.random() < self.settings.sample_rate
+
+    def start(self, ticket_id: str, agent: str) -> ProfileSession:
+        """Start profiling a run, must be called from the task running it."""
+        session = ProfileSession(self, ticket_id, agent)
+        if not self._sessions:
+            loop = asyncio.get_running_loop()
+            self._previous_factory = loop.get_task_factory()
+            loop.set_task_factory(self._task_factory)
+            self._sampler = StackSampler(loop, self._task_sessions, self.settings.interval)
+            self._sampler.start()
+        self._sessions.add(session)
+        self._task_sessions[asyncio.current_task()] = session
+        with self._sampler.lock:
+            self._sampler.sessions.add(session)
+        metrics.increment("profiled_runs", agent=agent)
+        return session.start()
+
+    async def _finish(self, session: ProfileSession) -> None:
+        self._sessions.discard(session)
+        self._task_sessions.pop(asyncio.current_task(), None)
+        sampler = self._sampler
+        with sampler.lock:
+            sampler.sessions.discard(session)
+        if not self._sessions:
+            asyncio.get_running_loop().set_task_factory(self._previous_factory)
+            self._previous_factory = None
+            self._sampler = None
+            await asyncio.to_thread(sampler.stop)
+
+    def _task_factory(self, loop: asyncio.AbstractEventLoop, coro: Any, **kwargs: Any) -> asyncio.Future:
+        if self._previous_factory is not None:
+            task = self._previous_factory(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        session = _current_session.get()
+        if session is None or session not in self._sessions:
+            return task
+        name = getattr(coro, '__qualname__', type(coro).__name__)
+        created = time.perf_counter()
+        self._task_sessions[task] = session
+
+        def done(_: asyncio.Future) -> None:
+            self._task_sessions.pop(task, None)
+            session.record_task(name, time.perf_counter() - created)
+
+        task.add_done_callback(done)
+        return task
+
+    def status(self) -> Dict[str, Any]:
+        directory = Path(self.settings.directory)
+        profiles = sorted(directory.glob('*.json'), reverse=True)[:20] if directory.is_dir() else []
+        settings = asdict(self.settings)
+        settings.pop('token')
+        return {**settings, 'active_sessions': len(self._sessions), 'recent_profiles': [p.name for p in profiles]}
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterable
+
+from langchain_core.messages import SystemMessage
+from langchain_core.runnables import RunnableConfig
+
+from cpr_langgraph_agent.guards import guard_messages
+from cpr_langgraph_agent.memory import compact_history
+from cpr_langgraph_agent.models import Ticket
+from cpr_langgraph_agent.usage import record_prompt_breakdown
+
+__all__ = ["data_message", "llm_input", "render_json", "ticket_message"]
+
+# CRM lists come back in no guaranteed order, the same data has to render to the same bytes.
+_SORT_KEYS = {
+    'consumption_points': ('consumption_point_id',),
+    'contracts': ('contract_id',),
+    'payments': ('contract_id', 'due_date', 'payment_id'),
+}
+
+
+def render_json(value: Any) -> str:
+    """Canonical JSON of prompt data: sorted keys, fixed indentation, no ASCII escaping."""
+    return json.dumps(value, indent=4, sort_keys=True, ensure_ascii=False)
+
+
+def ticket_message(ticket: Ticket) -> SystemMessage:
+    return SystemMessage(content=f'Following is the INCOMING TICKET: \n {render_json(ticket.model_dump(mode="json"))}')
+
+
+def data_message(content: Dict[str, Any]) -> SystemMessage:
+    return SystemMessage(content=f'Following are the CURRENT DATA provided by the tools and user: \n {render_json(content)}')
+
+
+def _canonical_data(state: Any, channels: Iterable[str]) -> Dict[str, Any]:
+    content = state.model_dump(mode='json', include=set(channels))
+    for channel, keys in _SORT_KEYS.items():
+        if content.get(channel):
+            content[channel] = sorted(content[channel], key=lambda item: tuple(str(item.get(k) or '') for k in keys))
+    return content
+
+
+async def llm_input(agent: str, system_prompt: str, state: Any, config: RunnableConfig, channels: Iterable[str]) -> Dict[str, Any]:
+    """``pre_model_hook`` output laid out for the prompt prefix cache of Azure OpenAI.
+
+    The cache only applies to a byte-identical prefix, so the messages go
+    from the most to the least stable: the static system prompt (added by
+    the agent, the tool schemas precede it in the request), the incoming
+    ticket that does not change within a thread, the append-only history
+    (bounded by the conversation memory, which may also return the cached
+    summary as a state update) and last the CURRENT DATA, which change with
+    every tool call.
+    """
+    history, update = await compact_history(config, agent, state)
+    content = _canonical_data(state, channels)
+    await record_prompt_breakdown(
+        config, agent, system_prompt, history,
+        {'incoming_ticket': state.incoming_ticket.model_dump(mode='json'), **content},
+    )
+    return {
+        **update,
+        "llm_input_messages": [
+            ticket_message(state.incoming_ticket),
+            *history,
+            data_message(content),
+            *guard_messages(config, agent, state),
+        ]
+    }
@@ -1,10 +1,11 @@
 
+import asyncio
 from typing import Annotated, List, Optional
-import json
 
 from langchain_core.documents import Document
-from langchain_core.messages import ToolMessage, SystemMessage
+from langchain_core.messages import ToolMessage
 from langchain_core.tools import InjectedToolCallId
+from langchain_core.runnables import RunnableConfig
 from langchain_openai import AzureChatOpenAI
 
 from langgraph.prebuilt import create_react_agent, InjectedState
@@ -15,8 +16,12 @@ from langchain_community.vectorstores.azuresearch import AzureSearch
 
 from cpr_langgraph_agent.agent_prompt import AGENT_PROMPT_2
 from cpr_langgraph_agent.models import Ticket
+from cpr_langgraph_agent.index_schema import ACTIVE_DOCUMENTS_FILTER
 from cpr_langgraph_agent.crm_client import AsyncCrmClient
 from cpr_langgraph_agent.state_models import AgentStateModel
+from cpr_langgraph_agent.prefetch import get_prefetch
+from cpr_langgraph_agent.deadline import DEFAULT_SEARCH_TIMEOUT, remaining_timeout
+from cpr_langgraph_agent.prompt_layout import llm_input
 
 class ReActAgent:
     def __init__(self, llm: AzureChatOpenAI, search: AzureSearch, crm_client: AsyncCrmClient, checkpointer: BaseCheckpointSaver):
@@ -40,26 +45,21 @@ class ReActAgent:
         self.search = search
         self.crm_client = crm_client
 
-    async def pre_model_hook(self, state: AgentStateModel):
-        content = state.model_dump(include={
-                    'incoming_ticket', 
-                    'customer',
-                    'consumption_points',
-                    'contracts',
-                    'payments',
-                    'similar_tickets'
-                })
-        state_data = SystemMessage(content=f'Following are the CURRENT DATA provided by the tools and user: \n {json.dumps(content, indent=4, ensure_ascii=False)}')
-        output = {
-            "llm_input_messages": [*state.messages, state_data]
-        }
-        return output
+    async def pre_model_hook(self, state: AgentStateModel, config: RunnableConfig):
+        return await llm_input(
+            'react_agent', AGENT_PROMPT_2, state, config,
+            channels=('customer', 'consumption_points', 'contracts', 'payments', 'similar_tickets'),
+        )
 
-    async def find_relevant_claims(self, tool_call_id: Annotated[str, InjectedToolCallId], search_term: str) -> Command:
+    async def find_relevant_claims(self, tool_call_id: Annotated[str, InjectedToolCallId], search_term: str, config: RunnableConfig) -> Command:
         """Use this tool to find relevant customer claim and complaint tickets"""
-        search_result: Document = await self.search.asemantic_hybrid_search(
-            query=search_term,
-            k=5,
+        search_result: Document = await asyncio.wait_for(
+            (get_prefetch(config) or self.search).asemantic_hybrid_search(
+                query=search_term,
+                k=5,
+                filters=ACTIVE_DOCUMENTS_FILTER,
+            ),
+            timeout=remaining_timeout(config, DEFAULT_SEARCH_TIMEOUT),
         )
         similar_tickets = []
         for document in search_result:
@@ -84,11 +84,11 @@ class ReActAgent:
             ]
         })
     
-    async def get_customer_by_email(self, tool_call_id: Annotated[str, InjectedToolCallId], state: Annotated[AgentStateModel, InjectedState]) -> Command:
+    async def get_customer_by_email(self, tool_call_id: Annotated[str, InjectedToolCallId], state: Annotated[AgentStateModel, InjectedState], config: RunnableConfig) -> Command:
         """
         Use this tool to retrieve customer details from CRM.
         """
-        customer = await self.crm_client.get_customer_by_email(state.incoming_ticket.email)
+        customer = await (get_prefetch(config) or self.crm_client).get_customer_by_email(state.incoming_ticket.email, timeout=remaining_timeout(config))
         return Command(update={
             'customer': customer,
             'messages': [
@@ -96,13 +96,13 @@ class ReActAgent:
             ]
         })
     
-    async def get_customer_consumption_points(self, tool_call_id: Annotated[str, InjectedToolCallId], state: Annotated[AgentStateModel, InjectedState], product_family: Optional[str] = None) -> Command:
+    async def get_customer_consumption_points(self, tool_call_id: Annotated[str, InjectedToolCallId], state: Annotated[AgentStateModel, InjectedState], config: RunnableConfig, product_family: Optional[str] = None) -> Command:
         """
         Use this tool to retrieve customer consumption points.
         Optionally you can filter consumption points by product family ('electricity' or 'gas') based on the incoming ticket contents
         """
         if state.customer:
-            consumption_points = await self.crm_client.get_customer_consumption_points(state.customer.customer_id, product_family=product_family)
+            consumption_points = await (get_prefetch(config) or self.crm_client).get_customer_consumption_points(state.customer.customer_id, product_family=product_family, timeout=remaining_timeout(config))
             return Command(update={
                 'consumption_points': consumption_points,
                 'messages': [
@@ -110,12 +110,12 @@ class ReActAgent:
                 ]
             })
 
-    async def get_customer_contracts(self, tool_call_id: Annotated[str, InjectedToolCallId], state: Annotated[AgentStateModel, InjectedState]) -> Command:
+    async def get_customer_contracts(self, tool_call_id: Annotated[str, InjectedToolCallId], state: Annotated[AgentStateModel, InjectedState], config: RunnableConfig) -> Command:
         """
         Use this tool to retrieve customer contracts
         """
         if state.customer:
-            contracts = await self.crm_client.get_customer_contracts(state.customer.customer_id)
+            contracts = await (get_prefetch(config) or self.crm_client).get_customer_contracts(state.customer.customer_id, timeout=remaining_timeout(config))
             return Command(update={
                 'contracts': contracts,
                 'messages': [
@@ -123,12 +123,12 @@ class ReActAgent:
                 ]
             })
     
-    async def get_contract_payments(self, tool_call_id: Annotated[str, InjectedToolCallId], state: Annotated[AgentStateModel, InjectedState], contract_ids: List[str]) -> Command:
+    async def get_contract_payments(self, tool_call_id: Annotated[str, InjectedToolCallId], state: Annotated[AgentStateModel, InjectedState], config: RunnableConfig, contract_ids: List[str]) -> Command:
         """
         Use this tool to retrieve contract payments by contract id. 
         """
         if state.customer:
-            payments = [await self.crm_client.get_contract_payments(state.customer.customer_id, contract_id) for contract_id in contract_ids]
+            payments = [await self.crm_client.get_contract_payments(state.customer.customer_id, contract_id, timeout=remaining_timeout(config)) for contract_id in contract_ids]
             return Command(update={
                 'payments': payments,
                 'messages': [
@@ -0,0 +1,71 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
+
+from langchain_core.messages import AIMessage
+
+from cpr_langgraph_agent.jobs import Job
+
+
+class AgentResponse(BaseModel):
+    ticket_id: str = Field(description='Identifier of the processed ticket')
+    draft_reply: Optional[str] = Field(description='Suggested reply to the customer', default=None)
+    customer_id: Optional[str] = Field(description='Identifier of the customer found for the ticket', default=None)
+    consumption_point_ids: List[str] = Field(description='Identifiers of the customer consumption points used', default_factory=list)
+    contract_ids: List[str] = Field(description='Identifiers of the customer contracts used', default_factory=list)
+    similar_ticket_ids: List[str] = Field(description='Identifiers of the similar tickets the reply is based on', default_factory=list)
+    near_duplicate_of: Optional[str] = Field(description='Ticket whose draft was personalized instead of running the agent', default=None)
+    similarity: Optional[float] = Field(description='Estimated similarity of the claim to the near-duplicate ticket', default=None)
+    usage: Dict[str, Any] = Field(description='Token usage and cost of the request', default_factory=dict)
+    guard: Dict[str, Any] = Field(description='Steps, corrections and termination reason of the agent loop', default_factory=dict)
+    trace: Optional[Dict[str, Any]] = Field(description='Full agent state with all messages, only with include=trace', default=None)
+    profile: Optional[str] = Field(description='Path of the profile summary when the run was profiled', default=None)
+
+    @classmethod
+    def from_output(cls, ticket_id: str, output: Dict[str, Any], **kwargs: Any) -> "AgentResponse":
+        """Build the response from the final state of the agent graph."""
+        draft_reply = next(
+            (
+                m.content for m in reversed(output.get('messages') or [])
+                if isinstance(m, AIMessage) and not m.tool_calls and isinstance(m.content, str) and m.content
+            ),
+            None,
+        )
+        customer = output.get('customer')
+        return cls(
+            ticket_id=ticket_id,
+            draft_reply=draft_reply,
+            customer_id=customer.customer_id if customer is not None else None,
+            consumption_point_ids=[cp.consumption_point_id for cp in output.get('consumption_points') or []],
+            contract_ids=[c.contract_id for c in output.get('contracts') or []],
+            similar_ticket_ids=[t.id for t in output.get('similar_tickets') or []],
+            **kwargs,
+        )
+
+
+class JobResponse(BaseModel):
+    id: str = Field(description='Job identifier')
+    agent: str = Field(description='Agent processing the ticket')
+    ticket_id: str = Field(description='Identifier of the processed ticket')
+    status: str = Field(description='queued, running, succeeded or failed')
+    attempts: int = Field(description='Number of started runs of the job')
+    error: Optional[str] = Field(description='Error of the last failed run', default=None)
+    created_at: datetime = Field(description='Time the job was submitted')
+    started_at: Optional[datetime] = Field(description='Time the last run started', default=None)
+    finished_at: Optional[datetime] = Field(description='Time the job finished', default=None)
+    result: Optional[AgentResponse] = Field(description='Agent response once the job succeeded', default=None)
+
+    @classmethod
+    def from_job(cls, job: Job) -> "JobResponse":
+        return cls(
+            id=job.id,
+            agent=job.agent,
+            ticket_id=job.ticket_id,
+            status=job.status,
+            attempts=job.attempts,
+            error=job.error,
+            created_at=datetime.fromtimestamp(job.created_at, timezone.utc),
+            started_at=datetime.fromtimestamp(job.started_at, timezone.utc) if job.started_at else None,
+            finished_at=datetime.fromtimestamp(job.finished_at, timezone.utc) if job.finished_at else None,
+            result=AgentResponse.model_validate(job.result) if job.result is not None else None,
+        )
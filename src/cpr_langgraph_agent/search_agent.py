@@ -1,10 +1,11 @@
 
+import asyncio
 from typing import Annotated
-import json
 
 from langchain_core.documents import Document
-from langchain_core.messages import ToolMessage, SystemMessage
+from langchain_core.messages import ToolMessage
 from langchain_core.tools import InjectedToolCallId
+from langchain_core.runnables import RunnableConfig
 from langchain_openai import AzureChatOpenAI
 
 from langgraph.prebuilt import create_react_agent
@@ -15,7 +16,11 @@ from langchain_community.vectorstores.azuresearch import AzureSearch
 
 from cpr_langgraph_agent.search_agent_prompts import AGENT_PROMPT
 from cpr_langgraph_agent.models import Ticket
+from cpr_langgraph_agent.index_schema import ACTIVE_DOCUMENTS_FILTER
 from cpr_langgraph_agent.state_models import AgentStateModel
+from cpr_langgraph_agent.prefetch import get_prefetch
+from cpr_langgraph_agent.deadline import DEFAULT_SEARCH_TIMEOUT, remaining_timeout
+from cpr_langgraph_agent.prompt_layout import llm_input
 
 class SearchAgent:
     def __init__(self, llm: AzureChatOpenAI, search: AzureSearch, checkpointer: BaseCheckpointSaver):
@@ -35,22 +40,18 @@ class SearchAgent:
         
         self.search = search
 
-    async def pre_model_hook(self, state: AgentStateModel):
-        content = state.model_dump(include={
-                    'incoming_ticket', 
-                    'similar_tickets'
-                })
-        state_data = SystemMessage(content=f'Following are the CURRENT DATA provided by the tools and user: \n {json.dumps(content, indent=4, ensure_ascii=False)}')
-        output = {
-            "llm_input_messages": [*state.messages, state_data]
-        }
-        return output
+    async def pre_model_hook(self, state: AgentStateModel, config: RunnableConfig):
+        return await llm_input('search_agent', AGENT_PROMPT, state, config, channels=('similar_tickets',))
 
-    async def find_relevant_claims(self, tool_call_id: Annotated[str, InjectedToolCallId], search_term: str) -> Command:
+    async def find_relevant_claims(self, tool_call_id: Annotated[str, InjectedToolCallId], search_term: str, config: RunnableConfig) -> Command:
         """Use this tool to find relevant customer claim and complaint tickets"""
-        search_result: Document = await self.search.asemantic_hybrid_search(
-            query=search_term,
-            k=5,
+        search_result: Document = await asyncio.wait_for(
+            (get_prefetch(config) or self.search).asemantic_hybrid_search(
+                query=search_term,
+                k=5,
+                filters=ACTIVE_DOCUMENTS_FILTER,
+            ),
+            timeout=remaining_timeout(config, DEFAULT_SEARCH_TIMEOUT),
         )
         similar_tickets = []
         for document in search_result:
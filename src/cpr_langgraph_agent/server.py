@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import math
+import multiprocessing
+import os
+from pathlib import Path
+from typing import Optional
+
+import uvicorn
+from dotenv import load_dotenv
+
+__all__ = ["available_cpus", "is_worker_process", "main", "worker_count"]
+
+MAX_DEFAULT_WORKERS = 8
+
+
+def available_cpus() -> int:
+    """CPUs this process may use: the affinity mask capped by the cgroup (container) CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on macOS and Windows
+        cpus = os.cpu_count() or 1
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def worker_count(configured: Optional[str] = None) -> int:
+    """``WEB_CONCURRENCY`` when set, otherwise one worker per available CPU up to ``MAX_DEFAULT_WORKERS``.
+
+    The agents mostly wait on Azure OpenAI, the CRM and the search, a
+    worker runs many requests concurrently; more workers than CPUs only add
+    memory and connection pools.
+    """
+    if configured:
+        return max(1, int(configured))
+    return min(available_cpus(), MAX_DEFAULT_WORKERS)
+
+
+def is_worker_process() -> bool:
+    """Whether this process is a worker of a multi-process server.
+
+    Neither server tells its workers how many there are: uvicorn starts
+    ``--workers`` (and ``--reload``) as spawned child processes, gunicorn
+    forks them from its arbiter, which sets ``SERVER_SOFTWARE``.
+    """
+    return multiprocessing.parent_process() is not None or os.getenv("SERVER_SOFTWARE", "").startswith("gunicorn")
+
+
+def main() -> None:
+    """Serve the app with uvicorn, with several worker processes on multi-core nodes.
+
+    Every worker builds its own clients in the app lifespan, state shared by
+    the workers (jobs, near-duplicate drafts and, with ``CHECKPOINT_DB_PATH``,
+    agent checkpoints) lives in SQLite files on the node.
+    """
+    load_dotenv()
+    workers = worker_count(os.getenv("WEB_CONCURRENCY"))
+    uvicorn.run(
+        "cpr_langgraph_agent.app:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", 8000)),
+        workers=workers,
+        reload=False,
+    )
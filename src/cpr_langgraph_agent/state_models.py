@@ -4,6 +4,10 @@ from langgraph.prebuilt.chat_agent_executor import AgentStatePydantic
 
 from cpr_langgraph_agent.models import Ticket, Customer, ConsumptionPoint, Contract, Payment
 
+class ConversationSummary(BaseModel):
+    content: str = Field(description='Summary of the earlier turns of the thread')
+    last_message_id: str = Field(description='Identifier of the last message covered by the summary')
+
 class AgentStateModel(AgentStatePydantic):
     incoming_ticket: Ticket = Field(description='Incoming ticket containing customer claim')
     customer: Optional[Customer] = Field(description='Customer details', default=None)
@@ -11,4 +15,5 @@ class AgentStateModel(AgentStatePydantic):
     contracts: Optional[List[Contract]] = Field(description='List of customer contracts', default=None)
     payments: Optional[List[Payment]] = Field(description='List of customer payments', default=None)
     similar_tickets: Optional[List[Ticket]] = Field(description='List of similar tickets', default=None)
+    conversation_summary: Optional[ConversationSummary] = Field(description='Rolling summary of the turns no longer sent to the model', default=None)
     # suggested_responses: Optional[List[str]] = Field(description='List of suggested responses to the customer claim', default=None)
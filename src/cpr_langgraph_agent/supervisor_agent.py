@@ -1,5 +1,6 @@
 from typing import List, Any
 
+from langchain_core.runnables import RunnableConfig
 from langchain_openai import AzureChatOpenAI
 
 from langgraph_supervisor import create_supervisor
@@ -7,6 +8,8 @@ from langgraph.checkpoint.base import BaseCheckpointSaver
 
 from cpr_langgraph_agent.supervisor_agent_prompts import AGENT_PROMPT
 from cpr_langgraph_agent.state_models import AgentStateModel
+from cpr_langgraph_agent.guards import guard_messages
+from cpr_langgraph_agent.memory import compact_history
 
 
 class SupervisorAgent:
@@ -17,7 +20,16 @@ class SupervisorAgent:
             model=llm,
             state_schema=AgentStateModel,
             prompt=AGENT_PROMPT,
+            pre_model_hook=self.pre_model_hook,
         )
         self.agent = self.supervisor.compile(checkpointer=checkpointer)
         with open("doc/cpr_langgraph_supervisor_agent.png", "wb") as f:
-            f.write(self.agent.get_graph().draw_mermaid_png())
\ No newline at end of file
+            f.write(self.agent.get_graph().draw_mermaid_png())
+
+    async def pre_model_hook(self, state: AgentStateModel, config: RunnableConfig):
+        history, update = await compact_history(config, 'supervisor', state)
+        output = {
+            **update,
+            "llm_input_messages": [*history, *guard_messages(config, 'supervisor', state)]
+        }
+        return output
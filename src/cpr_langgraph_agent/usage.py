@@ -0,0 +1,332 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import RunnableConfig
+
+from cpr_langgraph_agent.metrics import Metrics, metrics
+
+__all__ = [
+    "TokenPricing",
+    "UsageTracker",
+    "count_tokens",
+    "get_usage_tracker",
+    "graph_name",
+    "preload_tokenizer",
+    "record_prompt_breakdown",
+]
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING = "o200k_base"
+
+
+def _load_encoding():
+    """Load the tokenizer, ``None`` when tiktoken can not provide it (e.g. offline).
+
+    tiktoken downloads the BPE file on first use, so this blocks and must
+    not run on the event loop.
+    """
+    try:
+        import tiktoken
+
+        model = os.getenv("AZURE_OPENAI_MODEL_NAME")
+        try:
+            return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(DEFAULT_ENCODING)
+        except KeyError:
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        logger.warning("Tokenizer is not available, token counts are estimated from text length: %r", e)
+        return None
+
+
+# Set by ``preload_tokenizer``, token counts are estimated until then.
+_encoding: Any = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def preload_tokenizer() -> bool:
+    """Load the tokenizer once, ``False`` when only the estimate is available.
+
+    Blocking, call it from a thread (the app does so at startup).
+    """
+    global _encoding, _encoding_loaded
+    with _encoding_lock:
+        if not _encoding_loaded:
+            _encoding = _load_encoding()
+            _encoding_loaded = True
+    return _encoding is not None
+
+
+# Exact counts by digest of the text, the texts themselves (whole CURRENT DATA payloads) are not kept.
+_LENGTH_CACHE_SIZE = 8192
+_lengths: "OrderedDict[bytes, int]" = OrderedDict()
+_lengths_lock = threading.Lock()
+
+
+def _encoded_length(text: str) -> int:
+    key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    with _lengths_lock:
+        length = _lengths.get(key)
+        if length is not None:
+            _lengths.move_to_end(key)
+            return length
+    length = len(_encoding.encode(text, disallowed_special=()))
+    with _lengths_lock:
+        _lengths[key] = length
+        if len(_lengths) > _LENGTH_CACHE_SIZE:
+            _lengths.popitem(last=False)
+    return length
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens of ``text``, estimated from its length until the tokenizer is loaded.
+
+    History messages repeat every turn, so exact counts are cached.
+    """
+    if _encoding is None:
+        return (len(text) + 3) // 4
+    return _encoded_length(text)
+
+
+def _message_text(message: BaseMessage) -> str:
+    text = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        text += json.dumps(tool_calls, ensure_ascii=False)
+    return text
+
+
+@dataclass
+class TokenPricing:
+    """Prices per 1000 tokens, in any currency as long as it is the same for all three."""
+
+    prompt: float = 0.0
+    cached_prompt: float = 0.0
+    completion: float = 0.0
+
+    @classmethod
+    def from_env(cls) -> "TokenPricing":
+        return cls(
+            prompt=float(os.getenv("LLM_PROMPT_PRICE_PER_1K", 0)),
+            cached_prompt=float(os.getenv("LLM_CACHED_PROMPT_PRICE_PER_1K", 0)),
+            completion=float(os.getenv("LLM_COMPLETION_PRICE_PER_1K", 0)),
+        )
+
+    def cost(self, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> float:
+        return (
+            (prompt_tokens - cached_tokens) * self.prompt
+            + cached_tokens * self.cached_prompt
+            + completion_tokens * self.completion
+        ) / 1000
+
+
+@dataclass
+class LlmCall:
+    agent: str
+    node: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    cost: float = 0.0
+
+
+@dataclass
+class PromptBreakdown:
+    """Estimated token size of each part of a prompt sent by ``pre_model_hook``."""
+
+    agent: str
+    system_prompt: int
+    history: int
+    history_messages: int
+    current_data: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total(self) -> int:
+        return self.system_prompt + self.history + sum(self.current_data.values())
+
+
+def graph_name(metadata: Optional[Dict[str, Any]], root: str) -> str:
+    """Name of the (sub)graph from the ``langgraph_checkpoint_ns`` callback metadata.
+
+    The namespace is ``"<subgraph>:<id>|<node>:<id>"`` inside subgraphs and
+    just ``"<node>:<id>"`` in the root graph, named ``root``.
+    """
+    segments = (metadata or {}).get("langgraph_checkpoint_ns", "").split("|")
+    if len(segments) < 2:
+        return root
+    return segments[-2].split(":")[0]
+
+
+class UsageTracker(AsyncCallbackHandler):
+    """Per-request token accounting.
+
+    Registered as a callback to capture the token usage reported by every
+    LLM call, and put to the graph config under ``usage`` so the
+    ``pre_model_hook`` of each agent can record the size of the prompt it
+    builds.
+    """
+
+    def __init__(self, root_agent: str, pricing: Optional[TokenPricing] = None) -> None:
+        self.root_agent = root_agent
+        self.pricing = pricing or TokenPricing()
+        self.calls: List[LlmCall] = []
+        self.prompts: List[PromptBreakdown] = []
+        self._pending: Dict[UUID, LlmCall] = {}
+
+    def agent_name(self, metadata: Optional[Dict[str, Any]]) -> str:
+        return graph_name(metadata, self.root_agent)
+
+    async def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._pending[run_id] = LlmCall(
+            agent=self.agent_name(metadata),
+            node=(metadata or {}).get("langgraph_node", ""),
+        )
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        call = self._pending.pop(run_id, None)
+        if call is None:
+            return
+        usage = None
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        if usage:
+            call.prompt_tokens = usage.get("input_tokens", 0)
+            call.completion_tokens = usage.get("output_tokens", 0)
+            call.cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0)
+        elif response.llm_output and response.llm_output.get("token_usage"):
+            token_usage = response.llm_output["token_usage"]
+            call.prompt_tokens = token_usage.get("prompt_tokens", 0)
+            call.completion_tokens = token_usage.get("completion_tokens", 0)
+            call.cached_tokens = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+        call.cost = self.pricing.cost(call.prompt_tokens, call.cached_tokens, call.completion_tokens)
+        self.calls.append(call)
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._pending.pop(run_id, None)
+
+    def record_prompt(self, breakdown: PromptBreakdown) -> None:
+        self.prompts.append(breakdown)
+
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(call.prompt_tokens for call in self.calls)
+
+    @property
+    def completion_tokens(self) -> int:
+        return sum(call.completion_tokens for call in self.calls)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def summary(self) -> Dict[str, Any]:
+        """Usage of the request, returned to the caller in the response metadata."""
+        by_node: Dict[str, Dict[str, Any]] = {}
+        for call in self.calls:
+            totals = by_node.setdefault(f"{call.agent}/{call.node}", {
+                "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "cost": 0.0,
+            })
+            totals["llm_calls"] += 1
+            totals["prompt_tokens"] += call.prompt_tokens
+            totals["completion_tokens"] += call.completion_tokens
+            totals["cached_tokens"] += call.cached_tokens
+            totals["cost"] += call.cost
+        for totals in by_node.values():
+            totals["cache_hit_rate"] = _cache_hit_rate(totals["cached_tokens"], totals["prompt_tokens"])
+        cached_tokens = sum(call.cached_tokens for call in self.calls)
+        return {
+            "llm_calls": len(self.calls),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": cached_tokens,
+            "cache_hit_rate": _cache_hit_rate(cached_tokens, self.prompt_tokens),
+            "cost": sum(call.cost for call in self.calls),
+            "by_node": by_node,
+            "prompts": [{**asdict(prompt), "total": prompt.total} for prompt in self.prompts],
+        }
+
+    def publish(self, registry: Metrics = metrics) -> None:
+        """Aggregate the request usage into the process metrics."""
+        for call in self.calls:
+            labels = {"agent": call.agent, "node": call.node}
+            registry.increment("llm_calls", **labels)
+            registry.increment("llm_prompt_tokens", call.prompt_tokens, **labels)
+            registry.increment("llm_completion_tokens", call.completion_tokens, **labels)
+            registry.increment("llm_cached_tokens", call.cached_tokens, **labels)
+            registry.increment("llm_cost", call.cost, **labels)
+            if call.prompt_tokens:
+                registry.observe("llm_cache_hit_rate", call.cached_tokens / call.prompt_tokens, **labels)
+        for prompt in self.prompts:
+            registry.observe("prompt_tokens_system", prompt.system_prompt, agent=prompt.agent)
+            registry.observe("prompt_tokens_history", prompt.history, agent=prompt.agent)
+            for channel, tokens in prompt.current_data.items():
+                registry.observe("prompt_tokens_current_data", tokens, agent=prompt.agent, channel=channel)
+        registry.observe("request_prompt_tokens", self.prompt_tokens, agent=self.root_agent)
+        registry.observe("request_llm_calls", len(self.calls), agent=self.root_agent)
+
+
+def _cache_hit_rate(cached_tokens: int, prompt_tokens: int) -> float:
+    return round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0
+
+
+def get_usage_tracker(config: Optional[RunnableConfig]) -> Optional[UsageTracker]:
+    return (config or {}).get("configurable", {}).get("usage")
+
+
+def _prompt_breakdown(
+    agent: str,
+    system_prompt: str,
+    messages: Sequence[BaseMessage],
+    current_data: Dict[str, Any],
+) -> PromptBreakdown:
+    return PromptBreakdown(
+        agent=agent,
+        system_prompt=count_tokens(system_prompt),
+        history=sum(count_tokens(_message_text(m)) for m in messages),
+        history_messages=len(messages),
+        current_data={
+            channel: count_tokens(json.dumps(value, indent=4, ensure_ascii=False))
+            for channel, value in current_data.items()
+        },
+    )
+
+
+async def record_prompt_breakdown(
+    config: Optional[RunnableConfig],
+    agent: str,
+    system_prompt: str,
+    messages: Sequence[BaseMessage],
+    current_data: Dict[str, Any],
+) -> None:
+    """Record the size of a prompt built by ``pre_model_hook``, no-op without a tracker.
+
+    Rendering and encoding the CURRENT DATA of every turn is CPU work that
+    grows with the data, it runs in a thread instead of the event loop.
+    """
+    tracker = get_usage_tracker(config)
+    if tracker is None:
+        return
+    tracker.record_prompt(await asyncio.to_thread(_prompt_breakdown, agent, system_prompt, list(messages), current_data))
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List
+
+import openai
+from langchain_core.messages import HumanMessage
+from langchain_community.vectorstores.azuresearch import AzureSearch
+from langchain_openai import AzureChatOpenAI
+
+from cpr_langgraph_agent import models
+from cpr_langgraph_agent.checkpoint_serde import delete_threads
+from cpr_langgraph_agent.crm_client import AsyncCrmClient
+from cpr_langgraph_agent.metrics import metrics
+from cpr_langgraph_agent.state_models import AgentStateModel
+from cpr_langgraph_agent.usage import preload_tokenizer
+
+__all__ = ["Warmup", "WARMUP_TICKET"]
+
+logger = logging.getLogger(__name__)
+
+WARMUP_TICKET = models.Ticket(
+    id='warmup',
+    category_1='warmup',
+    category_2='warmup',
+    category_3='warmup',
+    status='new',
+    created_by='warmup',
+    eic='warmup',
+    email='warmup@example.invalid',
+    request_content='Warm-up ticket, no customer request.',
+)
+
+
+class Warmup:
+    """Opt-in warm-up of a freshly started worker.
+
+    Runs in the background after startup and does the one-off work that
+    would otherwise land on the first tickets: it opens the connection pools
+    to the CRM, Azure OpenAI and Azure AI Search, loads the tokenizer, builds
+    the Pydantic validators and invokes every compiled graph once in dry-run
+    mode (``AgentChatModel`` answers without calling the API, no tool is
+    called). A failed step is logged and does not block readiness, the
+    worker is just as cold as without warm-up.
+
+    After warm-up the connections are touched every ``keepalive_interval``
+    seconds, so idle periods do not let the pools expire.
+    """
+
+    def __init__(
+        self,
+        llm: AzureChatOpenAI,
+        search: AzureSearch,
+        crm_client: AsyncCrmClient,
+        graphs: Dict[str, Any],
+        *,
+        enabled: bool = True,
+        timeout: float = 60.0,
+        keepalive_interval: float = 0.0,
+    ) -> None:
+        self._llm = llm
+        self._search = search
+        self._crm_client = crm_client
+        self._graphs = graphs
+        self.enabled = enabled
+        self._timeout = timeout
+        self._keepalive_interval = keepalive_interval
+        self._tasks: list[asyncio.Task] = []
+        self.ready = False
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        # Dry-run threads by checkpointer, deleted together once all graphs ran.
+        self._threads: Dict[Any, List[str]] = {}
+
+    def start(self) -> None:
+        """Start warm-up in the background, must be called from a running event loop."""
+        if not self.enabled:
+            self.ready = True
+            return
+        self._tasks.append(asyncio.create_task(self._run()))
+
+    async def aclose(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def status(self) -> Dict[str, Any]:
+        return {'ready': self.ready, 'warmup': self.enabled, 'steps': self.steps}
+
+    async def _run(self) -> None:
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._warm_up(), timeout=self._timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Warm-up did not finish within %s s", self._timeout)
+        self.ready = True
+        logger.info("Warm-up finished in %.2f s: %s", time.monotonic() - started, self.steps)
+        if self._keepalive_interval > 0:
+            self._tasks.append(asyncio.create_task(self._keep_alive()))
+
+    async def _warm_up(self) -> None:
+        await asyncio.gather(
+            self._step('crm_connection', self._crm_client.warmup),
+            self._step('llm_connection', self._open_llm_connection),
+            self._step('search_connection', self._open_search_connection),
+            self._step('tokenizer', self._load_tokenizer),
+            self._step('validators', self._build_validators),
+        )
+        # The graphs run one by one, they share the checkpointer and the event loop with real requests.
+        try:
+            for name, graph in self._graphs.items():
+                await self._step(f'graph:{name}', lambda: self._dry_run(graph))
+        finally:
+            await self._step('checkpoints', self._delete_threads)
+
+    async def _step(self, name: str, step: Callable[[], Awaitable[Any]]) -> None:
+        started = time.monotonic()
+        try:
+            await step()
+            self.steps[name] = {'ok': True}
+        except Exception as e:
+            logger.warning("Warm-up step %s failed: %r", name, e)
+            self.steps[name] = {'ok': False, 'error': repr(e)}
+        elapsed = time.monotonic() - started
+        self.steps[name]['seconds'] = round(elapsed, 3)
+        metrics.observe("warmup_seconds", elapsed, step=name)
+
+    # ---------------------------------------------------------------------
+    # Steps
+    # ---------------------------------------------------------------------
+    async def _open_llm_connection(self) -> None:
+        # Any response opens the connection, the embeddings share the same endpoint.
+        try:
+            await self._llm.root_async_client.with_options(max_retries=0).models.list()
+        except openai.APIStatusError:
+            pass
+
+    async def _open_search_connection(self) -> None:
+        await self._search.async_client.get_document_count()
+
+    async def _load_tokenizer(self) -> None:
+        if not await asyncio.to_thread(preload_tokenizer):
+            raise RuntimeError("Tokenizer is not available, token counts are estimated")
+
+    async def _build_validators(self) -> None:
+        for model in (
+            models.Ticket, models.Address, models.Customer, models.ConsumptionPoint,
+            models.Contract, models.Payment, models.ClaimRecord, AgentStateModel,
+        ):
+            model.model_rebuild()
+            model.model_json_schema()
+
+    async def _dry_run(self, graph: Any) -> None:
+        thread_id = f'warmup-{uuid.uuid4()}'
+        state = AgentStateModel(
+            messages=[HumanMessage('Navrhni mi vhodnou odpověď na tento zákaznický požadavek na reklamaci.')],
+            incoming_ticket=WARMUP_TICKET,
+        )
+        if graph.checkpointer is not None:
+            self._threads.setdefault(graph.checkpointer, []).append(thread_id)
+        await graph.ainvoke(
+            input=state.model_dump(),
+            config={'configurable': {'thread_id': thread_id, 'dry_run': True}},
+        )
+
+    async def _delete_threads(self) -> None:
+        # Collecting the blobs scans every checkpoint, it runs once per checkpointer, not per graph.
+        threads, self._threads = self._threads, {}
+        for checkpointer, thread_ids in threads.items():
+            await delete_threads(checkpointer, thread_ids)
+
+    async def _keep_alive(self) -> None:
+        while True:
+            await asyncio.sleep(self._keepalive_interval)
+            await asyncio.gather(
+                self._touch(self._crm_client.warmup),
+                self._touch(self._open_llm_connection),
+                self._touch(self._open_search_connection),
+            )
+
+    @staticmethod
+    async def _touch(connect: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            await connect()
+        except Exception as e:
+            logger.debug("Keep-alive request failed: %r", e)
@@ -1,9 +1,50 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from mock_server.models import Address, Customer, ConsumptionPoint, Contract, Payment
+import asyncio
 import datetime
+import os
+import random
 
-app = FastAPI(title="Mock REST server")
+app = FastAPI(title="Mock REST server", default_response_class=ORJSONResponse)
+
+# fault injection ---------------------------------------
+class FaultInjection(BaseModel):
+    error_rate: float = Field(description='Share of requests answered by status_code', default=0.0, ge=0, le=1)
+    fail_next: int = Field(description='Number of next requests failing regardless of error_rate', default=0, ge=0)
+    status_code: int = Field(description='Status code of the injected failures', default=503, ge=400, le=599)
+    latency_seconds: float = Field(description='Delay added to every request', default=0.0, ge=0)
+    path_prefix: str = Field(description='Only requests of paths starting with the prefix are affected', default='/customers')
+
+faults = FaultInjection(
+    error_rate=float(os.getenv("MOCK_FAULT_ERROR_RATE", 0)),
+    status_code=int(os.getenv("MOCK_FAULT_STATUS_CODE", 503)),
+    latency_seconds=float(os.getenv("MOCK_FAULT_LATENCY_SECONDS", 0)),
+)
+
+@app.middleware("http")
+async def inject_faults(request: Request, call_next):
+    if not request.url.path.startswith(faults.path_prefix):
+        return await call_next(request)
+    if faults.latency_seconds:
+        await asyncio.sleep(faults.latency_seconds)
+    if faults.fail_next > 0 or random.random() < faults.error_rate:
+        faults.fail_next = max(faults.fail_next - 1, 0)
+        return ORJSONResponse({'detail': 'Injected fault'}, status_code=faults.status_code)
+    return await call_next(request)
+
+@app.get("/_faults")
+def get_faults() -> FaultInjection:
+    return faults
+
+@app.put("/_faults")
+def set_faults(settings: FaultInjection) -> FaultInjection:
+    """Replace the fault injection settings, ``{}`` turns the faults off."""
+    global faults
+    faults = settings
+    return faults
 
 # fake endpoints ----------------------------------------
 @app.get("/customers/by_email")
@@ -0,0 +1,138 @@
+"""AsyncCrmClient retries and circuit breaker against the mock server's fault injection."""
+import time
+
+import anyio
+import httpx
+import pytest
+
+from cpr_langgraph_agent.crm_client import APIError, AsyncCrmClient, CircuitOpenError
+from cpr_langgraph_agent.models import Customer
+from mock_server.app import app as mock_app
+
+BASE_URL = "http://crm.test"
+EMAIL = "karel@example.com"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def mock_crm():
+    """Client of the mock server admin endpoints, the faults are turned off after the test."""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=mock_app), base_url=BASE_URL) as client:
+        yield client
+        (await client.put("/_faults", json={})).raise_for_status()
+
+
+async def set_faults(mock_crm: httpx.AsyncClient, **settings) -> None:
+    (await mock_crm.put("/_faults", json=settings)).raise_for_status()
+
+
+@pytest.fixture
+async def crm_client():
+    """Factory of clients talking to the mock server in-process, closed after the test."""
+    clients = []
+
+    def create(**kwargs) -> AsyncCrmClient:
+        kwargs.setdefault("retry_backoff", 0.001)
+        client = AsyncCrmClient(BASE_URL, transport=httpx.ASGITransport(app=mock_app), **kwargs)
+        clients.append(client)
+        return client
+
+    yield create
+    for client in clients:
+        await client.aclose()
+
+
+@pytest.mark.anyio
+async def test_transient_server_error_is_retried(mock_crm, crm_client):
+    await set_faults(mock_crm, fail_next=2, status_code=503)
+    client = crm_client(max_retries=2)
+
+    customer = await client.get_customer_by_email(EMAIL)
+
+    assert isinstance(customer, Customer)
+    assert (await mock_crm.get("/_faults")).json()["fail_next"] == 0
+    assert client.stats()["breakers"]["/customers/by_email"]["state"] == "closed"
+
+
+@pytest.mark.anyio
+async def test_retries_give_up_after_max_retries(mock_crm, crm_client):
+    await set_faults(mock_crm, fail_next=3, status_code=503)
+    client = crm_client(max_retries=1)
+
+    with pytest.raises(APIError, match="503"):
+        await client.get_customer_by_email(EMAIL)
+    assert (await mock_crm.get("/_faults")).json()["fail_next"] == 1
+
+
+@pytest.mark.anyio
+async def test_consecutive_failures_open_the_breaker(mock_crm, crm_client):
+    await set_faults(mock_crm, error_rate=1.0, status_code=502)
+    client = crm_client(max_retries=0, breaker_failures=3)
+
+    for _ in range(3):
+        with pytest.raises(APIError) as error:
+            await client.get_customer_by_email(EMAIL)
+        assert not isinstance(error.value, CircuitOpenError)
+
+    breaker = client.stats()["breakers"]["/customers/by_email"]
+    assert breaker["state"] == "open"
+    assert breaker["consecutive_failures"] == 3
+
+
+@pytest.mark.anyio
+async def test_open_breaker_fails_fast(mock_crm, crm_client):
+    await set_faults(mock_crm, error_rate=1.0)
+    client = crm_client(max_retries=0, breaker_failures=1, breaker_reset_timeout=60)
+    with pytest.raises(APIError):
+        await client.get_customer_by_email(EMAIL)
+    # Slow responses would show up in the duration if a request was still sent.
+    await set_faults(mock_crm, error_rate=1.0, latency_seconds=0.5)
+
+    started = time.perf_counter()
+    for _ in range(5):
+        with pytest.raises(CircuitOpenError):
+            await client.get_customer_by_email(EMAIL)
+
+    assert time.perf_counter() - started < 0.1
+    assert client.stats()["breakers"]["/customers/by_email"]["rejected"] == 5
+    # Breakers are per endpoint, the others still send requests.
+    await set_faults(mock_crm)
+    assert await client.get_customer_contracts("123456789")
+
+
+@pytest.mark.anyio
+async def test_probe_after_cooldown_closes_the_breaker(mock_crm, crm_client):
+    await set_faults(mock_crm, error_rate=1.0)
+    client = crm_client(max_retries=0, breaker_failures=1, breaker_reset_timeout=0.05)
+    with pytest.raises(APIError):
+        await client.get_customer_by_email(EMAIL)
+    with pytest.raises(CircuitOpenError):
+        await client.get_customer_by_email(EMAIL)
+
+    await set_faults(mock_crm)
+    await anyio.sleep(0.06)
+    customer = await client.get_customer_by_email(EMAIL)
+
+    assert isinstance(customer, Customer)
+    breaker = client.stats()["breakers"]["/customers/by_email"]
+    assert breaker["state"] == "closed"
+    assert breaker["consecutive_failures"] == 0
+
+
+@pytest.mark.anyio
+async def test_failed_probe_opens_the_breaker_again(mock_crm, crm_client):
+    await set_faults(mock_crm, error_rate=1.0)
+    client = crm_client(max_retries=0, breaker_failures=1, breaker_reset_timeout=0.05)
+    with pytest.raises(APIError):
+        await client.get_customer_by_email(EMAIL)
+
+    await anyio.sleep(0.06)
+    with pytest.raises(APIError) as error:
+        await client.get_customer_by_email(EMAIL)
+
+    assert not isinstance(error.value, CircuitOpenError)
+    assert client.stats()["breakers"]["/customers/by_email"]["state"] == "open"